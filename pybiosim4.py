@@ -1,18 +1,60 @@
 #!/usr/bin/env python3
 
 # pybiosim4
+#
+# Runs the simulator. With --replay <generation>, shows the agent
+# trajectories of a generation recorded in logs/trajectories.bin instead
+# (see saveTrajectories in biosim4.ini and src/trajectory.py).
+
+import argparse
 
 BLACK = (0, 0, 0)
 WHITE = (200, 200, 200)
 WINDOW_HEIGHT = 500
 WINDOW_WIDTH = 500
 
-# Import pygame 
+# Import pygame
 import pygame
 
-from src.simulator import Simulator
+from src.imageWriter import ImageFrameData, renderFrame
+from src.params import paramsInit
+from src.trajectory import TrajectoryFile
+
+
+# Plays the recorded simSteps of a generation over and over, until the
+# user quits
+def replay(generation, filename):
+    p = paramsInit("biosim4.ini")
+    trajectories = TrajectoryFile(filename).read(generation)
+    p.sizeX, p.sizeY = trajectories.sizeX, trajectories.sizeY
+    pygame.display.set_caption("pybiosim4 - generation {}".format(generation))
+
+    simStep = 0
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+
+        alive = trajectories.alive[simStep]
+        data = ImageFrameData(simStep, generation, trajectories.locX[simStep][alive],
+                              trajectories.locY[simStep][alive], trajectories.colors[alive],
+                              trajectories.barrierLocs)
+        image = renderFrame(p, data)
+        surface = pygame.surfarray.make_surface(image.transpose(1, 0, 2))
+        SCREEN.blit(pygame.transform.scale(surface, (WINDOW_WIDTH, WINDOW_HEIGHT)), (0, 0))
+        pygame.display.update()
+
+        simStep = (simStep + 1) % trajectories.numSteps()
+        CLOCK.tick(30)
+
 
 def main():
+    parser = argparse.ArgumentParser(description="pybiosim4")
+    parser.add_argument("--replay", type=int, metavar="GENERATION",
+                        help="replay a generation recorded with saveTrajectories")
+    parser.add_argument("--trajectories", default="logs/trajectories.bin", metavar="FILE",
+                        help="the recording to replay (default: %(default)s)")
+    args = parser.parse_args()
 
     global SCREEN, CLOCK
     pygame.init()
@@ -26,25 +68,37 @@ def main():
     # Fill the background
     SCREEN.fill(BLACK)
 
+    if args.replay is not None:
+        replay(args.replay, args.trajectories)
+        pygame.quit()
+        return
 
-    # Run until the user quits
-    running = True
-    while running:
+    # Importing the simulator creates generation 0, not needed for a replay
+    from src.simulator import Simulator
 
-        s = Simulator()
-        #s.drawGrid()
+    # Run until the user quits. close() writes the rows of the epoch log
+    # still buffered and finishes the video and trajectory files.
+    s = None
+    try:
+        running = True
+        while running:
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+            s = Simulator()
+            #s.drawGrid()
 
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
 
-        # Flip the display
-        pygame.display.update()
 
-        # rate x frames per second
-        CLOCK.tick(30)
+            # Flip the display
+            pygame.display.update()
 
+            # rate x frames per second
+            CLOCK.tick(30)
+    finally:
+        if s is not None:
+            s.close()
 
     # quit
     pygame.quit()
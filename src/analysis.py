@@ -0,0 +1,11 @@
+# analysis.py -- various reports
+#
+# See analysis.cpp for the C++ reports, and epochLog.py for the epoch log.
+
+import numpy as np
+
+
+# Average number of genes of the population. The C++ version samples 100
+# individuals; the lengths are a column here, so all of them are averaged.
+def averageGenomeLength(peeps):
+    return float(np.mean(peeps.genomeLength[1:peeps.individuals]))
@@ -0,0 +1,125 @@
+# basicTypes.py
+#
+# Basic types used throughout the project. See basicTypes.h for notes.
+#
+# In the NumPy port a Dir is stored as its uint8 Compass value and a Coord as
+# a pair of int16 x, y values (usually whole columns of them), so the member
+# functions of Dir and Coord become lookup tables indexed by Compass value.
+
+from enum import IntEnum
+
+import numpy as np
+
+
+class Compass(IntEnum):
+    SW = 0
+    S = 1
+    SE = 2
+    W = 3
+    CENTER = 4
+    E = 5
+    NW = 6
+    N = 7
+    NE = 8
+
+
+'''
+    A Dir value maps to a normalized Coord using
+
+       Coord { (d%3) - 1, (trunc)(d/3) - 1 }
+
+       0 => -1, -1
+       1 =>  0, -1
+       2 =>  1, -1,
+       3 => -1,  0
+       4 =>  0,  0
+       5 =>  1   0
+       6 => -1,  1
+       7 =>  0,  1
+       8 =>  1,  1
+'''
+NORMALIZED_X = np.array([(d % 3) - 1 for d in range(9)], dtype=np.int16)
+NORMALIZED_Y = np.array([(d // 3) - 1 for d in range(9)], dtype=np.int16)
+
+# One step clockwise / counterclockwise (1/8 of a full rotation)
+ROTATE_RIGHT = np.array([3, 0, 1, 6, 4, 2, 7, 8, 5], dtype=np.uint8)
+ROTATE_LEFT = np.array([1, 2, 5, 0, 4, 8, 3, 6, 7], dtype=np.uint8)
+
+
+# Returns the table mapping each Compass value to the value rotated by n
+# steps. Positive values are clockwise; negative values are counterclockwise.
+def rotationTable(n):
+    table = np.arange(9, dtype=np.uint8)
+    step = ROTATE_RIGHT if n > 0 else ROTATE_LEFT
+    for _ in range(abs(n)):
+        table = step[table]
+    return table
+
+
+ROTATE_90_CW = rotationTable(2)
+ROTATE_90_CCW = rotationTable(-2)
+ROTATE_180 = rotationTable(4)
+
+# The eight directions, i.e. every Compass value except CENTER
+DIRS8 = np.array([d for d in Compass if d != Compass.CENTER], dtype=np.uint8)
+
+
+# Returns n random directions, none of them CENTER
+def random8(rng, n):
+    return DIRS8[rng.integers(0, 8, size=n)]
+
+
+# Coord.asDir(): calculate the angle of an offset, round to the nearest 360/8
+# degree slice, then convert the slice to a Compass value. (0, 0) is CENTER.
+#
+#     slice:  3  2  1     Compass:  6  7  8
+#             4     0               3  4  5
+#             5  6  7               0  1  2
+_SLICE_TO_COMPASS = np.array([Compass.E, Compass.NE, Compass.N, Compass.NW,
+                              Compass.W, Compass.SW, Compass.S, Compass.SE], dtype=np.uint8)
+
+
+def asDir(x, y):
+    TWO_PI = np.float32(3.1415927 * 2.0)
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    angle = np.arctan2(y, x)
+    angle = np.where(angle < 0.0, angle + TWO_PI, angle)
+    angle += TWO_PI / 16.0  # offset by half a slice
+    angle = np.where(angle > TWO_PI, angle - TWO_PI, angle)
+    slice = np.minimum((angle / (TWO_PI / 8.0)).astype(np.int32), 7)  # find which division it's in
+    return np.where((x == 0) & (y == 0), np.uint8(Compass.CENTER), _SLICE_TO_COMPASS[slice])
+
+
+# Coord.length(): the length of an offset, rounded down
+def length(x, y):
+    return np.sqrt(np.asarray(x, dtype=np.float64) ** 2 + np.asarray(y, dtype=np.float64) ** 2).astype(np.int32)
+
+
+# returns -1.0 (opposite directions) .. +1.0 (same direction)
+# returns 1.0 if either vector is (0,0), e.g. when dir is CENTER
+def raySameness(x, y, dir):
+    otherX = float(NORMALIZED_X[dir])
+    otherY = float(NORMALIZED_Y[dir])
+    mag1 = np.sqrt(x * x + y * y)
+    mag2 = np.sqrt(otherX * otherX + otherY * otherY)
+    if mag1 == 0.0 or mag2 == 0.0:
+        return 1.0  # anything is "same" as zero vector
+
+    dot = x * otherX + y * otherY
+    cos = dot / (mag1 * mag2)
+    return min(max(cos, -1.0), 1.0)  # clip
+
+
+# Number of set bits of each element of an unsigned integer array, as uint8.
+# np.bitwise_count() is new in NumPy 2.0; older versions add up the bit
+# counts of the bytes of each element from a table.
+_BYTE_BIT_COUNTS = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+
+def countBits(a):
+    a = np.asarray(a)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(a)
+    octets = np.ascontiguousarray(a).view(np.uint8).reshape(a.shape + (a.itemsize,))
+    return _BYTE_BIT_COUNTS[octets].sum(axis=-1, dtype=np.uint8)
@@ -0,0 +1,70 @@
+# brainCache.py
+#
+# With low mutation rates most of the children of a generation have a genome
+# identical to their parent's or a sibling's, and identical genomes wire into
+# identical neural nets. BrainCache sits in front of the wiring compiler
+# (see genome.createWiringFromGenomes()): it keeps the most recently used
+# NeuralNets keyed by the bytes of their packed genome, and only the genomes
+# it hasn't seen are compiled, all together. NeuralNets are immutable, so
+# one net is shared by all the individuals with that genome.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from src.genome import GENE_DTYPE, createWiringFromGenomes, packGenomes, unpackGenomes
+
+
+class BrainCache:
+    """ LRU cache of compiled neural nets keyed by genome"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.nets = OrderedDict()  # genome bytes -> NeuralNet, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Returns the NeuralNets of the genomes packed in genes with the specified
+    # lengths, in the same order, compiling only the ones not in the cache.
+    def wire(self, genes, lengths, p):
+        genomes = unpackGenomes(np.asarray(genes, dtype=GENE_DTYPE), lengths)
+        keys = [genome.tobytes() for genome in genomes]
+
+        # Genomes can repeat within the batch too; compile each one once
+        missing = {}
+        for key, genome in zip(keys, genomes):
+            if key not in self.nets and key not in missing:
+                missing[key] = genome
+        compiled = {}
+        if missing:
+            compiled = dict(zip(missing, createWiringFromGenomes(*packGenomes(list(missing.values())), p)))
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        nets = []
+        for key in keys:
+            net = compiled[key] if key in compiled else self.nets[key]
+            nets.append(net)
+            self.nets[key] = net
+            self.nets.move_to_end(key)
+
+        while len(self.nets) > self.capacity:
+            self.nets.popitem(last=False)
+            self.evictions += 1
+        return nets
+
+    # Returns the NeuralNet of one genome
+    def wireOne(self, genome, p):
+        return self.wire(genome, [len(genome)], p)[0]
+
+    def clear(self):
+        self.nets.clear()
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return "brain cache: {} nets, {} hits, {} misses, {} evictions, hit rate {:.1%}".format(
+            len(self.nets), self.hits, self.misses, self.evictions, self.hitRate())
@@ -0,0 +1,138 @@
+# createBarrier.py
+#
+# This generates barrier points, which are grid locations with value
+# BARRIER. A list of barrier locations is saved in Grid.barrierLocations
+# and, for some scenarios, Grid.barrierCenters. Those members are available
+# read-only with Grid.getBarrierLocations(). This function assumes an empty
+# grid. This is typically called by the main simulator thread after
+# Grid.init() or Grid.zeroFill().
+#
+# Barriers don't move during a generation, so this is also where the
+# distances to the nearest barrier in each direction are computed, once,
+# for the probe sensors (see Grid.barrierSteps and probeSteps()).
+
+# This file typically is under constant development and change for
+# specific scenarios.
+
+import numpy as np
+
+from src.basicTypes import length
+from src.grid import BARRIER, probeSteps, visitNeighborhood
+
+
+def createBarrier(grid, barrierType, p, rng):
+    barrierLocations = []
+    barrierCenters = []  # used only for some barrier types
+
+    def drawBox(minX, minY, maxX, maxY):
+        for x in range(minX, maxX + 1):
+            for y in range(minY, maxY + 1):
+                barrierLocations.append((x, y))
+
+    def randomUint(min, max):
+        return int(rng.integers(min, max + 1))
+
+    if barrierType == 0:
+        pass
+
+    # Vertical bar in constant location
+    elif barrierType == 1:
+        minX = p.sizeX // 2
+        maxX = minX + 1
+        minY = p.sizeY // 4
+        maxY = minY + p.sizeY // 2
+        drawBox(minX, minY, maxX, maxY)
+
+    # Vertical bar in random location
+    elif barrierType == 2:
+        minX = randomUint(20, p.sizeX - 20)
+        maxX = minX + 1
+        minY = randomUint(20, p.sizeY // 2 - 20)
+        maxY = minY + p.sizeY // 2
+        drawBox(minX, minY, maxX, maxY)
+
+    # five blocks staggered
+    elif barrierType == 3:
+        blockSizeX = 2
+        blockSizeY = p.sizeX // 3
+
+        x0 = p.sizeX // 4 - blockSizeX // 2
+        y0 = p.sizeY // 4 - blockSizeY // 2
+        x1 = x0 + blockSizeX
+        y1 = y0 + blockSizeY
+
+        drawBox(x0, y0, x1, y1)
+        x0 += p.sizeX // 2
+        x1 = x0 + blockSizeX
+        drawBox(x0, y0, x1, y1)
+        y0 += p.sizeY // 2
+        y1 = y0 + blockSizeY
+        drawBox(x0, y0, x1, y1)
+        x0 -= p.sizeX // 2
+        x1 = x0 + blockSizeX
+        drawBox(x0, y0, x1, y1)
+        x0 = p.sizeX // 2 - blockSizeX // 2
+        x1 = x0 + blockSizeX
+        y0 = p.sizeY // 2 - blockSizeY // 2
+        y1 = y0 + blockSizeY
+        drawBox(x0, y0, x1, y1)
+
+    # Horizontal bar in constant location
+    elif barrierType == 4:
+        minX = p.sizeX // 4
+        maxX = minX + p.sizeX // 2
+        minY = p.sizeY // 2 + p.sizeY // 4
+        maxY = minY + 2
+        drawBox(minX, minY, maxX, maxY)
+
+    # Three floating islands -- different locations every generation
+    elif barrierType == 5:
+        radius = 3.0
+        margin = 2 * int(radius)
+
+        def randomLoc():
+            return (randomUint(margin, p.sizeX - margin), randomUint(margin, p.sizeY - margin))
+
+        def distance(a, b):
+            return length(a[0] - b[0], a[1] - b[1])
+
+        center0 = randomLoc()
+
+        center1 = randomLoc()
+        while distance(center0, center1) < margin:
+            center1 = randomLoc()
+
+        center2 = randomLoc()
+        while distance(center0, center2) < margin or distance(center1, center2) < margin:
+            center2 = randomLoc()
+
+        barrierCenters.append(center0)
+        #barrierCenters.append(center1)
+        #barrierCenters.append(center2)
+
+        visitNeighborhood(center0, radius, barrierLocations.append, p.sizeX, p.sizeY)
+        #visitNeighborhood(center1, radius, barrierLocations.append, p.sizeX, p.sizeY)
+        #visitNeighborhood(center2, radius, barrierLocations.append, p.sizeX, p.sizeY)
+
+    # Spots, specified number, radius, locations
+    elif barrierType == 6:
+        numberOfLocations = 5
+        radius = 5.0
+
+        verticalSliceSize = p.sizeY // (numberOfLocations + 1)
+
+        for n in range(1, numberOfLocations + 1):
+            loc = (p.sizeX // 2, n * verticalSliceSize)
+            visitNeighborhood(loc, radius, barrierLocations.append, p.sizeX, p.sizeY)
+            barrierCenters.append(loc)
+
+    else:
+        raise ValueError("Invalid barrierType {}".format(barrierType))
+
+    grid.barrierLocations = np.array(barrierLocations, dtype=np.int16).reshape(-1, 2)
+    grid.barrierCenters = np.array(barrierCenters, dtype=np.int16).reshape(-1, 2)
+    grid.set(grid.barrierLocations[:, 0], grid.barrierLocations[:, 1], BARRIER)
+
+    # 8 directional sweeps; agents don't stop a barrier probe
+    barriers = grid.barrierMask()
+    grid.barrierSteps = probeSteps(barriers, np.zeros_like(barriers))
@@ -0,0 +1,18 @@
+# endOfGeneration.py
+
+from src.imageWriter import isVideoGeneration
+from src.trajectory import isTrajectoryGeneration
+
+
+# At the end of each generation, save a video file (if p.saveVideo is true),
+# the agent trajectories (if p.saveTrajectories is true) and update the
+# simulation progress graph (if p.updateGraphLog is true).
+def endOfGeneration(generation, p, imageWriter, trajectoryRecorder, epochLog):
+    if isVideoGeneration(generation, p):
+        imageWriter.saveGenerationVideo(generation)
+
+    if isTrajectoryGeneration(generation, p):
+        trajectoryRecorder.saveGeneration(generation)
+
+    if p.updateGraphLog and (generation == 1 or ((generation % p.updateGraphLogStride) == 0)):
+        epochLog.updateGraph(p.graphLogUpdateCommand)
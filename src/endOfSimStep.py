@@ -0,0 +1,75 @@
+# endOfSimStep.py
+
+import numpy as np
+
+from src.basicTypes import length
+from src.imageWriter import isVideoGeneration
+from src.survivalCriteria import CHALLENGE_RADIOACTIVE_WALLS, CHALLENGE_TOUCH_ANY_WALL, CHALLENGE_LOCATION_SEQUENCE
+
+
+# At the end of each sim step, this function is called in single-thread
+# mode to take care of several things:
+#
+# 1. We may kill off some agents if a "radioactive" scenario is in progress.
+# 2. We may flag some agents as meeting some challenge criteria, if such
+#    a scenario is in progress.
+# 3. We then drain the deferred death queue.
+# 4. We then drain the deferred movement queue.
+# 5. We fade the signal layer(s) (pheromones).
+# 6. We save the resulting world condition as a single image frame (if
+#    p.saveVideo is true).
+#
+# The challenge steps work on the peeps columns of the whole population at
+# once, rows 1..p.population (index 0 is reserved).
+def endOfSimStep(simStep, generation, p, peeps, grid, signals, imageWriter, rng):
+    rows = slice(1, p.population + 1)
+
+    if p.challenge == CHALLENGE_RADIOACTIVE_WALLS:
+        # During the first half of the generation, the west wall is radioactive,
+        # where X == 0. In the last half of the generation, the east wall is
+        # radioactive, where X = the area width - 1. There's an exponential
+        # falloff of the danger, falling off to zero at the arena half line.
+        radioactiveX = 0 if simStep < p.stepsPerGeneration // 2 else p.sizeX - 1
+
+        distanceFromRadioactiveWall = np.abs(peeps.locX[rows].astype(np.int32) - radioactiveX)
+        # The chance of death is 1 / distance; a random number r is below
+        # it if r * distance < 1, which also holds against the wall itself
+        dies = ((distanceFromRadioactiveWall < p.sizeX // 2)
+                & (rng.random(p.population) * distanceFromRadioactiveWall < 1.0)
+                & peeps.alive[rows])
+        peeps.queueForDeath(np.flatnonzero(dies) + 1)
+
+    # If the individual is touching any wall, we set its challengeFlag to true.
+    # At the end of the generation, all those with the flag true will reproduce.
+    if p.challenge == CHALLENGE_TOUCH_ANY_WALL:
+        onEdge = grid.isBorder(peeps.locX[rows], peeps.locY[rows])
+        peeps.challengeBits[rows][onEdge] = 1
+
+    # If this challenge is enabled, the individual gets a bit set in their challengeBits
+    # member if they are within a specified radius of a barrier center. They have to
+    # visit the barriers in sequential order.
+    if p.challenge == CHALLENGE_LOCATION_SEQUENCE:
+        radius = 9.0
+        centers = grid.getBarrierCenters().astype(np.int32)
+        if len(centers) > 0:
+            bits = peeps.challengeBits[rows]
+            # The next center to visit is the one of the lowest bit not set yet
+            n = np.arange(len(centers), dtype=np.uint32)
+            bitSet = (bits[:, None] >> n) & 1 != 0
+            hasNext = ~bitSet.all(axis=1)
+            nextCenter = bitSet.argmin(axis=1)
+
+            # (population, numCenters) distances to the barrier centers
+            distance = length(peeps.locX[rows, None].astype(np.int32) - centers[:, 0],
+                              peeps.locY[rows, None].astype(np.int32) - centers[:, 1])
+            reached = hasNext & (distance[np.arange(len(bits)), nextCenter] <= radius)
+            bits[reached] |= np.uint32(1) << nextCenter[reached].astype(np.uint32)
+
+    peeps.drainDeathQueue(grid)
+    peeps.drainMoveQueue(grid)
+
+    signals.fade(0)  # takes layerNum  todo!!!
+
+    # saveVideoFrame() only queues a snapshot of the frame, see imageWriter.py
+    if isVideoGeneration(generation, p):
+        imageWriter.saveVideoFrame(simStep, generation, peeps, grid)
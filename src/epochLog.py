@@ -0,0 +1,150 @@
+# epochLog.py
+#
+# The epoch log: one row of statistics per generation, written to
+# p.logDir/epoch-log.<format>, see appendEpochLog() in analysis.cpp.
+#
+# analysis.cpp opens the log file, appends one line and closes it again
+# every generation. EpochLog keeps the file open and collects the rows,
+# writing them p.epochLogFlushInterval generations at a time. The columns
+# are named (see COLUMNS) and p.epochLogFormat selects the file format:
+#
+#     txt   one line of space-separated values per generation, the format
+#           read by tools/graphlog.gp
+#     csv   the same with a header line of column names
+#     bin   a header naming the columns and their types, followed by
+#           fixed-size little-endian records; see readBinaryEpochLog()
+#
+# A new log is started whenever generation 0 is logged, i.e. at the start
+# of a run and when the simulation starts over.
+
+import os
+import struct
+import subprocess
+import time
+
+import numpy as np
+
+from src.analysis import averageGenomeLength
+from src.genomeCompare import geneticDiversity
+
+COLUMNS = (
+    ("generation", "<u4"),
+    ("survivors", "<u4"),
+    ("diversity", "<f8"),
+    ("avgGenomeLength", "<f8"),
+    ("murders", "<u4"),
+    ("simStepSeconds", "<f8"),     # wall time of the simSteps of the generation
+    ("analysisSeconds", "<f8"),    # wall time of the statistics of the row
+)
+ROW_DTYPE = np.dtype(list(COLUMNS))
+
+_MAGIC = b"EPLG"
+
+
+class EpochLog:
+    """ Buffered writer of the epoch log"""
+
+    def __init__(self, p):
+        self.p = p
+        self.filename = os.path.join(p.logDir, "epoch-log." + p.epochLogFormat)
+        self.file = None
+        self.rows = []
+        # Timings of the current generation, measured by the caller
+        self.timings = {}
+        self.graphProcess = None
+        self.graphFailed = False
+        self.graphSkipped = False
+
+    # Adds the row of a generation. The statistics are taken from the
+    # population before it is replaced by the next generation.
+    def append(self, generation, numberSurvivors, murderCount, peeps, rng):
+        start = time.perf_counter()
+
+        # The genomes of everybody, alive or not, in index order
+        genes, lengths = peeps.getGenomes(np.arange(1, peeps.individuals))
+        diversity = geneticDiversity(genes, lengths, self.p.genomeComparisonMethod, self.p.analysisSampleSize, rng)
+        avgGenomeLength = averageGenomeLength(peeps)
+
+        if generation == 0 or self.file is None:
+            self._open()
+        self.rows.append((generation, numberSurvivors, diversity, avgGenomeLength, murderCount,
+                          self.timings.get("simStepSeconds", 0.0), time.perf_counter() - start))
+        self.timings = {}
+        if len(self.rows) >= self.p.epochLogFlushInterval:
+            self.flush()
+
+    # Starts a new log file, dropping the rows not written yet
+    def _open(self):
+        if self.file is not None:
+            self.file.close()
+        self.rows = []
+        os.makedirs(self.p.logDir, exist_ok=True)
+        self.file = open(self.filename, "wb" if self.p.epochLogFormat == "bin" else "w")
+
+        if self.p.epochLogFormat == "csv":
+            self.file.write(",".join(name for name, _ in COLUMNS) + "\n")
+        elif self.p.epochLogFormat == "bin":
+            self.file.write(_MAGIC + struct.pack("<H", len(COLUMNS)))
+            for name, dtype in COLUMNS:
+                self.file.write(struct.pack("<B", len(name)) + name.encode() + dtype.encode())
+        self.file.flush()
+
+    # Writes the collected rows to the file
+    def flush(self):
+        if self.file is None:
+            return
+        if self.rows:
+            if self.p.epochLogFormat == "bin":
+                self.file.write(np.array(self.rows, dtype=ROW_DTYPE).tobytes())
+            else:
+                separator = "," if self.p.epochLogFormat == "csv" else " "
+                self.file.write("".join(separator.join(str(v) for v in row) + "\n" for row in self.rows))
+            self.rows = []
+        self.file.flush()
+
+    # Writes the rows so far and starts the graph log update command through
+    # the shell, as std::system() does, without waiting for it. The command
+    # is skipped while the previous one is still running, and for good once
+    # it couldn't be started. tools/graphlog.gp reads epoch-log.txt, so the
+    # graph is only updated with the txt format.
+    def updateGraph(self, command):
+        self.flush()
+        if self.p.epochLogFormat != "txt":
+            if not self.graphSkipped:
+                print("Graph log not updated: {} needs epochLogFormat = txt".format(command))
+                self.graphSkipped = True
+            return
+        if self.graphFailed or (self.graphProcess is not None and self.graphProcess.poll() is None):
+            return
+        try:
+            self.graphProcess = subprocess.Popen(command, shell=True)
+        except OSError as e:
+            print("Couldn't run {}: {}".format(command, e))
+            self.graphProcess = None
+            self.graphFailed = True
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Returns the rows of a bin format epoch log as a structured array, with one
+# field per column, read through a memory map
+def readBinaryEpochLog(filename):
+    with open(filename, "rb") as f:
+        if f.read(4) != _MAGIC:
+            raise ValueError("{}: not a binary epoch log".format(filename))
+        numColumns, = struct.unpack("<H", f.read(2))
+        columns = []
+        for _ in range(numColumns):
+            length, = struct.unpack("<B", f.read(1))
+            columns.append((f.read(length).decode(), f.read(3).decode()))
+        offset = f.tell()
+
+    dtype = np.dtype(columns)
+    numRows = (os.path.getsize(filename) - offset) // dtype.itemsize
+    if numRows == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=(numRows,))
@@ -0,0 +1,183 @@
+# executeActions.py -- Executes the actions computed for a single simStep for the
+# whole population
+#
+# See executeActions.cpp for the per-individual version and the notes about
+# what each action neuron does. Here the action levels of all the individuals
+# arrive at once, as the matrix returned by NeuralNetBatch.feedForward(), and
+# every action is evaluated for every individual with array operations.
+#
+# As in executeActions.cpp, the members an individual owns (responsiveness,
+# oscPeriod, longProbeDist) are changed immediately. Everything that touches
+# the grid, the signal layers or other individuals is returned instead as an
+# ActionIntents, to be applied by the caller at the end of the simStep.
+
+import numpy as np
+
+from src.basicTypes import DIRS8, NORMALIZED_X, NORMALIZED_Y, ROTATE_90_CW, ROTATE_90_CCW
+from src.sensorsActions import Action, ACTION_MIN, ACTION_RANGE, isEnabled
+
+
+# Given an array of factors in the range 0.0..1.0 of the individuals in
+# index, returns an array of bools, each true with probability equal to its
+# factor. For example, if a factor == 0.2, then there is a 20% chance its
+# bool is true. rng is the RowStreams of the simStep (see rng.py).
+def prob2bool(factor, rng, index):
+    return rng.random(index) < factor
+
+
+# This takes a probability from 0.0..1.0 and adjusts it according to an
+# exponential curve. The steepness of the curve is determined by the K factor
+# which is a small positive integer. This tends to reduce the activity level
+# a bit (makes the peeps less reactive and jittery).
+def responseCurve(r, p):
+    k = p.responsivenessCurveKFactor
+    return np.power(r - 2.0, -2.0 * k) - np.power(2.0, -2.0 * k) * (1.0 - r)
+
+
+class ActionIntents:
+    """ Moves, kills and signal emissions wanted by the population"""
+
+    def __init__(self, moveIndex, moveX, moveY, killIndex, emitIndex):
+        # Individuals that want to move, and where to
+        self.moveIndex = moveIndex
+        self.moveX = moveX
+        self.moveY = moveY
+        # Individuals that are going to be killed
+        self.killIndex = killIndex
+        # Individuals that emit one unit of signal0 at their location
+        self.emitIndex = emitIndex
+
+
+# Executes the actions of the individuals in rows lo..hi-1. actionLevels has
+# one row of NUM_ACTIONS raw action levels per individual in the same range.
+# Dead individuals don't act. rng is the RowStreams of the simStep, which
+# gives every individual the same random numbers whatever slice of the
+# population it is processed in. Returns an ActionIntents.
+def executeActions(p, peeps, grid, actionLevels, rng, lo=0, hi=None):
+    hi = peeps.individuals if hi is None else hi
+    living = np.flatnonzero(peeps.alive[lo:hi])
+    index = living + lo
+    levels = np.asarray(actionLevels, dtype=np.float32)[living]
+
+    def level(action):
+        return levels[:, action]
+
+    # Responsiveness action - convert neuron action level from arbitrary float range
+    # to the range 0.0..1.0. If this action neuron is enabled but not driven, will
+    # default to mid-level 0.5.
+    if isEnabled(Action.SET_RESPONSIVENESS):
+        peeps.responsiveness[index] = (np.tanh(level(Action.SET_RESPONSIVENESS)) + 1.0) / 2.0
+
+    # For the rest of the action outputs, we'll apply an adjusted responsiveness
+    # factor (see responseCurve() for more info). Range 0.0..1.0.
+    responsivenessAdjusted = responseCurve(peeps.responsiveness[index], p)
+
+    # Oscillator period action - convert action level nonlinearly to
+    # 2..4*p.stepsPerGeneration. If this action neuron is enabled but not driven,
+    # will default to 1.5 + e^(3.5) = a period of 34 simSteps.
+    if isEnabled(Action.SET_OSCILLATOR_PERIOD):
+        newPeriodf01 = (np.tanh(level(Action.SET_OSCILLATOR_PERIOD)) + 1.0) / 2.0  # convert to 0.0..1.0
+        peeps.oscPeriod[index] = 1 + (1.5 + np.exp(7.0 * newPeriodf01)).astype(np.int32)
+
+    # Set longProbeDistance - convert action level to 1..maxLongProbeDistance.
+    # If this action neuron is enabled but not driven, will default to
+    # mid-level period of 17 simSteps.
+    if isEnabled(Action.SET_LONGPROBE_DIST):
+        maxLongProbeDistance = 32
+        probeLevel = (np.tanh(level(Action.SET_LONGPROBE_DIST)) + 1.0) / 2.0  # convert to 0.0..1.0
+        peeps.longProbeDist[index] = (1 + probeLevel * maxLongProbeDistance).astype(np.uint32)
+
+    # Emit signal0 - if this action value is below a threshold, nothing emitted.
+    # Otherwise convert the action value to a probability of emitting one unit of
+    # signal (pheromone). If this action neuron is enabled but not driven,
+    # nothing will be emitted.
+    emitIndex = index[:0]
+    if isEnabled(Action.EMIT_SIGNAL0):
+        emitThreshold = 0.5  # 0.0..1.0; 0.5 is midlevel
+        emitLevel = (np.tanh(level(Action.EMIT_SIGNAL0)) + 1.0) / 2.0  # convert to 0.0..1.0
+        emitLevel *= responsivenessAdjusted
+        emitIndex = index[(emitLevel > emitThreshold) & prob2bool(emitLevel, rng, index)]
+
+    lastMoveDir = peeps.lastMoveDir[index]
+    locX = peeps.locX[index].astype(np.int32)
+    locY = peeps.locY[index].astype(np.int32)
+
+    # Kill forward -- if this action value is > threshold, value is converted to probability
+    # of an attempted murder. Probabilities under the threshold are considered 0.0.
+    # If this action neuron is enabled but not driven, the neighbors are safe.
+    killIndex = index[:0]
+    if isEnabled(Action.KILL_FORWARD) and p.killEnable:
+        killThreshold = 0.5  # 0.0..1.0; 0.5 is midlevel
+        killLevel = (np.tanh(level(Action.KILL_FORWARD)) + 1.0) / 2.0  # convert to 0.0..1.0
+        killLevel *= responsivenessAdjusted
+        killer = (killLevel > killThreshold) & prob2bool((killLevel - ACTION_MIN) / ACTION_RANGE, rng, index)
+        otherX = locX[killer] + NORMALIZED_X[lastMoveDir[killer]]
+        otherY = locY[killer] + NORMALIZED_Y[lastMoveDir[killer]]
+        inBounds = grid.isInBounds(otherX, otherY)
+        otherX, otherY = otherX[inBounds], otherY[inBounds]
+        occupied = grid.isOccupiedAt(otherX, otherY)
+        other = grid.at(otherX[occupied], otherY[occupied])
+        killIndex = other[peeps.alive[other]]
+
+    # ------------- Movement action neurons ---------------
+
+    # There are multiple action neurons for movement. Each type of movement neuron
+    # urges the individual to move in some specific direction. We sum up all the
+    # X and Y components of all the movement urges, then pass the X and Y sums through
+    # a transfer function (tanh()) to get a range -1.0..1.0. The absolute values of the
+    # X and Y values are passed through prob2bool() to convert to -1, 0, or 1, then
+    # multiplied by the component's signum. This results in the x and y components of
+    # a normalized movement offset. See executeActions.cpp for an example.
+
+    # The forward, left, right and random urges act along directions looked up
+    # per individual from the direction tables.
+    def addUrge(action, dirs, sign=1.0):
+        nonlocal moveX, moveY
+        if isEnabled(action):
+            moveX = moveX + sign * NORMALIZED_X[dirs] * level(action)
+            moveY = moveY + sign * NORMALIZED_Y[dirs] * level(action)
+
+    # moveX,moveY will be the accumulators that will hold the sum of all the
+    # urges to move along each axis. (+- floating values of arbitrary range)
+    moveX = level(Action.MOVE_X).copy() if isEnabled(Action.MOVE_X) else np.zeros(len(index), np.float32)
+    moveY = level(Action.MOVE_Y).copy() if isEnabled(Action.MOVE_Y) else np.zeros(len(index), np.float32)
+
+    if isEnabled(Action.MOVE_EAST):
+        moveX += level(Action.MOVE_EAST)
+    if isEnabled(Action.MOVE_WEST):
+        moveX -= level(Action.MOVE_WEST)
+    if isEnabled(Action.MOVE_NORTH):
+        moveY += level(Action.MOVE_NORTH)
+    if isEnabled(Action.MOVE_SOUTH):
+        moveY -= level(Action.MOVE_SOUTH)
+
+    addUrge(Action.MOVE_FORWARD, lastMoveDir)
+    addUrge(Action.MOVE_REVERSE, lastMoveDir, -1.0)
+    addUrge(Action.MOVE_LEFT, ROTATE_90_CCW[lastMoveDir])
+    addUrge(Action.MOVE_RIGHT, ROTATE_90_CW[lastMoveDir])
+    addUrge(Action.MOVE_RL, ROTATE_90_CW[lastMoveDir])
+    if isEnabled(Action.MOVE_RANDOM):
+        addUrge(Action.MOVE_RANDOM, DIRS8[rng.integers(0, 8, index)])
+
+    # Convert the accumulated X, Y sums to the range -1.0..1.0 and scale by the
+    # individual's responsiveness (0.0..1.0) (adjusted by a curve)
+    moveX = np.tanh(moveX) * responsivenessAdjusted
+    moveY = np.tanh(moveY) * responsivenessAdjusted
+
+    # The probability of movement along each axis is the absolute value
+    probX = prob2bool(np.abs(moveX), rng, index)  # convert abs(level) to 0 or 1
+    probY = prob2bool(np.abs(moveY), rng, index)  # convert abs(level) to 0 or 1
+
+    # The direction of movement (if any) along each axis is the sign
+    signumX = np.where(moveX < 0.0, -1, 1)
+    signumY = np.where(moveY < 0.0, -1, 1)
+
+    # Generate a normalized movement offset, where each component is -1, 0, or 1,
+    # and move there if it's a valid location
+    newX = locX + probX * signumX
+    newY = locY + probY * signumY
+    valid = grid.isInBounds(newX, newY)
+    valid[valid] = grid.isEmptyAt(newX[valid], newY[valid])
+
+    return ActionIntents(index[valid], newX[valid].astype(np.int16), newY[valid].astype(np.int16),
+                         killIndex, emitIndex)
@@ -0,0 +1,123 @@
+# feedForward.py - reads sensors, computes actions, for the whole population
+#
+# This does the neural net feed-forward operation, sensor (input) neurons
+# through internal neurons to action (output) neurons, for every individual
+# at once. See feedForward.cpp for the per-individual version and the notes
+# about the three kinds of neurons.
+#
+# In feedForward.cpp the connections of one individual are ordered so that
+# all the connections to neurons are summed before any connection to an
+# action. The neuron outputs are latched (passed through tanh(), except for
+# undriven neurons which act as bias feeds and don't change) when the first
+# connection to an action is reached. So within one simStep:
+#
+#     neuron inputs  = sensors . W(sensor->neuron) + previous outputs . W(neuron->neuron)
+#     neuron outputs = tanh(neuron inputs) where driven, else unchanged
+#     action levels  = sensors . W(sensor->action) + new outputs . W(neuron->action)
+#
+# NeuralNetBatch packs the connection lists of all the individuals into dense
+# per-individual weight matrices, padded to the largest neuron count in the
+# population, so one simStep of the whole population is two batched matrix
+# products and one vectorized tanh().
+
+import numpy as np
+
+from src.genomeNeurons import NEURON, SENSOR, ACTION, initialNeuronOutput, weightAsFloat
+from src.sensorsActions import NUM_SENSES, NUM_ACTIONS
+
+
+class NeuralNetBatch:
+    """ Neural nets of the whole population, evaluated together"""
+
+    # individuals is the number of rows, one per peeps index (row 0 reserved)
+    def __init__(self, individuals):
+        self.individuals = individuals
+        self.numConnections = np.zeros(individuals, dtype=np.uint32)
+        self._allocate(0)
+
+    # The inputs of every connection are the concatenation of the sensor
+    # values and the neuron outputs: rows 0..NUM_SENSES-1 of the weight
+    # matrices are sensors, rows NUM_SENSES.. are neurons.
+    def _allocate(self, numNeurons):
+        n = self.individuals
+        self.numNeurons = numNeurons
+        self.toNeurons = np.zeros((n, NUM_SENSES + numNeurons, numNeurons), dtype=np.float32)
+        self.toActions = np.zeros((n, NUM_SENSES + numNeurons, NUM_ACTIONS), dtype=np.float32)
+        self.driven = np.zeros((n, numNeurons), dtype=np.bool_)
+        self.neuronOutputs = np.zeros((n, numNeurons), dtype=np.float32)
+
+    # Wires the individuals in indexes with the NeuralNets in nets. All the
+    # connections are scattered into the weight matrices in one pass.
+    def load(self, indexes, nets):
+        indexes = np.asarray(indexes, dtype=np.intp)
+        numNeurons = max((net.numNeurons() for net in nets), default=0)
+        if numNeurons > self.numNeurons:
+            # Grow the padding, keeping the individuals that aren't reloaded
+            old = (self.toNeurons, self.toActions, self.driven, self.neuronOutputs, self.numNeurons)
+            self._allocate(numNeurons)
+            self._copyFrom(*old)
+
+        self.toNeurons[indexes] = 0.0
+        self.toActions[indexes] = 0.0
+        self.driven[indexes] = False
+        self.neuronOutputs[indexes] = initialNeuronOutput()
+        self.numConnections[indexes] = 0
+        if len(nets) == 0:
+            return
+
+        counts = np.array([net.numConnections() for net in nets])
+        self.numConnections[indexes] = counts
+        row = np.repeat(indexes, counts)
+        sourceType = np.concatenate([net.sourceType for net in nets])
+        sourceNum = np.concatenate([net.sourceNum for net in nets]).astype(np.intp)
+        sinkType = np.concatenate([net.sinkType for net in nets])
+        sinkNum = np.concatenate([net.sinkNum for net in nets]).astype(np.intp)
+        weight = weightAsFloat(np.concatenate([net.weight for net in nets]).astype(np.float32))
+
+        source = np.where(sourceType == SENSOR, sourceNum, NUM_SENSES + sourceNum)
+        toNeuron = sinkType == NEURON
+        toAction = sinkType == ACTION
+        # Duplicate connections simply add up, as they do in feedForward.cpp
+        np.add.at(self.toNeurons, (row[toNeuron], source[toNeuron], sinkNum[toNeuron]), weight[toNeuron])
+        np.add.at(self.toActions, (row[toAction], source[toAction], sinkNum[toAction]), weight[toAction])
+
+        neuronCounts = np.array([net.numNeurons() for net in nets])
+        neuronRow = np.repeat(indexes, neuronCounts)
+        neuronNum = np.concatenate([np.arange(c) for c in neuronCounts]) if neuronCounts.sum() else np.zeros(0, np.intp)
+        self.driven[neuronRow, neuronNum] = np.concatenate([net.driven for net in nets])
+
+    def _copyFrom(self, toNeurons, toActions, driven, neuronOutputs, numNeurons):
+        s, n = NUM_SENSES, numNeurons
+        self.toNeurons[:, :s, :n] = toNeurons[:, :s, :]
+        self.toNeurons[:, s:s + n, :n] = toNeurons[:, s:, :]
+        self.toActions[:, :s] = toActions[:, :s]
+        self.toActions[:, s:s + n] = toActions[:, s:]
+        self.driven[:, :n] = driven
+        self.neuronOutputs[:, :n] = neuronOutputs
+
+    # Computes one simStep for the individuals in rows lo..hi-1 (default: all
+    # of them). sensorValues holds one row of NUM_SENSES values per individual
+    # in the same range. Returns the raw action levels, an array of shape
+    # (hi - lo, NUM_ACTIONS) of +- float values in an arbitrary range;
+    # undriven actions are 0.0. The latched neuron outputs are updated in place.
+    def feedForward(self, sensorValues, lo=0, hi=None):
+        rows = slice(lo, self.individuals if hi is None else hi)
+        outputs = self.neuronOutputs[rows]
+
+        inputs = np.empty((outputs.shape[0], NUM_SENSES + self.numNeurons), dtype=np.float32)
+        inputs[:, :NUM_SENSES] = sensorValues
+        inputs[:, NUM_SENSES:] = outputs
+
+        accumulators = np.matmul(inputs[:, None, :], self.toNeurons[rows])[:, 0, :]
+        outputs = np.where(self.driven[rows], np.tanh(accumulators), outputs)
+        self.neuronOutputs[rows] = outputs
+
+        inputs[:, NUM_SENSES:] = outputs
+        return np.matmul(inputs[:, None, :], self.toActions[rows])[:, 0, :]
+
+    # Returns a mask of the sensors read by any of the neural nets in rows
+    # lo..hi-1, so the sensor stage can skip the others.
+    def sensorsInUse(self, lo=0, hi=None):
+        rows = slice(lo, self.individuals if hi is None else hi)
+        return ((self.toNeurons[rows, :NUM_SENSES] != 0.0).any(axis=(0, 2))
+                | (self.toActions[rows, :NUM_SENSES] != 0.0).any(axis=(0, 2)))
@@ -1,432 +1,306 @@
-# genome.cpp
+# genome.py
+#
+# Genes and genomes. See genome-neurons.h for notes and genome.cpp for the
+# per-gene C++ version.
+#
+# A gene is one packed uint32, with the same field widths as struct Gene:
+#
+#     bit  0      sourceType  SENSOR or NEURON
+#     bits 1..7   sourceNum
+#     bit  8      sinkType    NEURON or ACTION
+#     bits 9..15  sinkNum
+#     bits 16..31 weight      signed 16-bit
+#
+# A genome is a uint32 array of genes, and the genomes of a whole population
+# are concatenated in one contiguous buffer, with the offset and length of
+# each individual's genome kept in the peeps columns (see
+# Peeps.setGenomes()). The field accessors below are bit operations that
+# work on any array of genes at once, so mutation, crossover, comparison,
+# hashing and serialization are all array operations.
 
-#include <vector>
-#include <map>
-#include <list>
-#include <iostream>
-#include <cassert>
-#include <string>
-#include "simulator.h"
-#include "random.h"
+import numpy as np
 
-namespace BS
+from src.genomeNeurons import NEURON, ACTION, NeuralNet
+from src.sensorsActions import NUM_SENSES, NUM_ACTIONS
 
-# This structure is used while converting the connection list to a
-# neural net. This helps us to find neurons that don't feed anything
-# so that they can be removed along with all the connections that
-# feed the useless neurons. We'll cull neurons with .numOutputs == 0
-# or those that only feed themselves, i.e., .numSelfInputs == .numOutputs.
-# Finally, we'll renumber the remaining neurons sequentially starting
-# at zero using the .remappedNumber member.
-struct Node
-    uint16_t remappedNumber
-    uint16_t numOutputs
-    uint16_t numSelfInputs
-    uint16_t numInputsFromSensorsOrOtherNeurons
+GENE_DTYPE = np.uint32
 
+_SOURCE_TYPE_SHIFT = 0
+_SOURCE_NUM_SHIFT = 1
+_SINK_TYPE_SHIFT = 8
+_SINK_NUM_SHIFT = 9
+_WEIGHT_SHIFT = 16
 
 
-# Two neuron renumberings occur: The original genome uses a uint16_t for
-# neuron numbers. The first renumbering maps 16-bit unsigned neuron numbers
-# to the range 0..p.maxNumberNeurons - 1. After culling useless neurons
-# (see comments above), we'll renumber the remaining neurons sequentially
-# starting at 0.
-typedef std.map<uint16_t, NodeMap; # key is neuron number 0..p.maxNumberNeurons - 1
+def sourceType(genes):
+    return ((genes >> _SOURCE_TYPE_SHIFT) & 0x1).astype(np.uint8)
 
-typedef std.list<Gene> ConnectionList
 
+def sourceNum(genes):
+    return ((genes >> _SOURCE_NUM_SHIFT) & 0x7f).astype(np.uint16)
+
+
+def sinkType(genes):
+    return ((genes >> _SINK_TYPE_SHIFT) & 0x1).astype(np.uint8)
 
-# Returns by value a single gene with random members.
-# See genome.h for the width of the members.
-# ToDo: don't assume the width of the members in gene.
-def makeRandomGene(self):
-    Gene gene
 
-    gene.sourceType = randomUint() & 1
-    gene.sourceNum = (uint16_t)randomUint(0, 0x7fff)
-    gene.sinkType = randomUint() & 1
-    gene.sinkNum = (uint16_t)randomUint(0, 0x7fff)
-    gene.weight = Gene.makeRandomWeight()
+def sinkNum(genes):
+    return ((genes >> _SINK_NUM_SHIFT) & 0x7f).astype(np.uint16)
+
+
+def weight(genes):
+    return (np.asarray(genes, dtype=GENE_DTYPE) >> _WEIGHT_SHIFT).astype(np.uint16).astype(np.int16)
+
+
+# Packs arrays of gene fields into genes. The fields are truncated to their
+# widths as the C++ bit-fields are.
+def makeGenes(sourceType, sourceNum, sinkType, sinkNum, weight):
+    genes = (np.asarray(sourceType, dtype=GENE_DTYPE) & 0x1) << _SOURCE_TYPE_SHIFT
+    genes |= (np.asarray(sourceNum, dtype=GENE_DTYPE) & 0x7f) << _SOURCE_NUM_SHIFT
+    genes |= (np.asarray(sinkType, dtype=GENE_DTYPE) & 0x1) << _SINK_TYPE_SHIFT
+    genes |= (np.asarray(sinkNum, dtype=GENE_DTYPE) & 0x7f) << _SINK_NUM_SHIFT
+    genes |= (np.asarray(weight, dtype=np.int64).astype(GENE_DTYPE) & 0xffff) << _WEIGHT_SHIFT
+    return genes
+
+
+def makeRandomWeight(rng, n):
+    return rng.integers(0, 0xefff, size=n, endpoint=True) - 0x8000
+
+
+# Returns n genes with random members.
+def makeRandomGenes(rng, n):
+    return makeGenes(rng.integers(0, 2, size=n),
+                     rng.integers(0, 0x7fff, size=n, endpoint=True),
+                     rng.integers(0, 2, size=n),
+                     rng.integers(0, 0x7fff, size=n, endpoint=True),
+                     makeRandomWeight(rng, n))
+
+
+# Returns n random genomes in one buffer, as (genes, lengths). The lengths
+# are random in p.genomeInitialLengthMin..p.genomeInitialLengthMax.
+def makeRandomGenomes(p, rng, n):
+    lengths = rng.integers(p.genomeInitialLengthMin, p.genomeInitialLengthMax, size=n, endpoint=True)
+    return makeRandomGenes(rng, int(lengths.sum())), lengths
+
+
+# Returns the start of each genome in a buffer of genomes of these lengths
+def genomeOffsets(lengths):
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    return offsets
+
+
+# Concatenates a list of genomes into one buffer, returns (genes, lengths)
+def packGenomes(genomes):
+    lengths = np.array([len(genome) for genome in genomes], dtype=np.int64)
+    if len(genomes) == 0:
+        return np.zeros(0, dtype=GENE_DTYPE), lengths
+    return np.concatenate(genomes).astype(GENE_DTYPE, copy=False), lengths
+
+
+# Splits a buffer of genomes back into a list of views, one per genome
+def unpackGenomes(genes, lengths):
+    return np.split(genes, np.cumsum(lengths)[:-1])
+
+
+# -------------------------------- Reproduction --------------------------------
+#
+# generateChildGenomes() produces the genomes of a whole generation at once,
+# with the steps of generateChildGenome() in genome.cpp done for all the
+# children together: the parents of every child are drawn in one call, the
+# overlay of the slice of the shorter parent is a mask over the output
+# positions, cropping and gene insertion/deletion are offsets into the
+# parents' genes, and the point mutations are a binomial count of bit flips
+# per child scattered over the new buffer.
 
-    return gene
+# Flips one random bit in a random gene of each of the genomes located by
+# offsets and lengths in genes, in place, like randomBitFlip() in
+# genome.cpp (method 1): sourceType, sinkType, sourceNum, sinkNum or weight
+# with a 20% chance each. A genome may be listed several times. A flip of
+# bit 7 of sourceNum or sinkNum is lost, as it is in the 7-bit C++ bit-fields.
+def randomBitFlips(genes, offsets, lengths, rng):
+    n = len(offsets)
+    elementIndex = np.asarray(offsets, dtype=np.int64) + rng.integers(0, lengths, size=n)
+    bitIndex8 = rng.integers(0, 8, size=n)
+    weightBit = rng.integers(1, 16, size=n)
+    field = np.searchsorted([0.2, 0.4, 0.6, 0.8], rng.random(n), side="right")
 
+    shift = np.choose(field, [np.full(n, _SOURCE_TYPE_SHIFT), np.full(n, _SINK_TYPE_SHIFT),
+                              _SOURCE_NUM_SHIFT + bitIndex8, _SINK_NUM_SHIFT + bitIndex8,
+                              _WEIGHT_SHIFT + weightBit])
+    kept = ~(((field == 2) | (field == 3)) & (bitIndex8 == 7))
+    np.bitwise_xor.at(genes, elementIndex[kept], GENE_DTYPE(1) << shift[kept].astype(GENE_DTYPE))
 
 
-# Returns by value a single genome with random genes.
-def makeRandomGenome(self):
-    Genome genome
-
-    length = randomUint(p.genomeInitialLengthMin, p.genomeInitialLengthMax)
-    for (n = 0; n < length; ++n)
-        genome.push_back(makeRandomGene())
-
-
-    return genome
-
-
-
-# Convert the indiv's genome to a renumbered connection list.
-# This renumbers the neurons from their uint16_t values in the genome
-# to the range 0..p.maxNumberNeurons - 1 by using a modulo operator.
-# Sensors are renumbered 0..Sensor.NUM_SENSES - 1
-# Actions are renumbered 0..Action.NUM_ACTIONS - 1
-def makeRenumberedConnectionList(self, &connectionList, &genome):
-    connectionList.clear()
-    for (auto  &gene : genome)
-        connectionList.push_back(gene)
-        auto &conn = connectionList.back()
-
-        if conn.sourceType == NEURON:
-            conn.sourceNum %= p.maxNumberNeurons
-
-        else:
-            conn.sourceNum %= Sensor.NUM_SENSES
-
-
-        if conn.sinkType == NEURON:
-            conn.sinkNum %= p.maxNumberNeurons
-
-        else:
-            conn.sinkNum %= Action.NUM_ACTIONS
-
-
-
-
-
-# Scan the connections and make a list of all the neuron numbers
-# mentioned in the connections. Also keep track of how many inputs and
-# outputs each neuron has.
-def makeNodeList(self, &nodeMap, &connectionList):
-    nodeMap.clear()
-
-    for ( Gene &conn : connectionList)
-        if conn.sinkType == NEURON:
-            it = nodeMap.find(conn.sinkNum)
-            if it == nodeMap.end():
-                assert(conn.sinkNum < p.maxNumberNeurons)
-                nodeMap.insert(std.pair<uint16_t, Node>(conn.sinkNum, {} ))
-                it = nodeMap.find(conn.sinkNum)
-                assert(it.first < p.maxNumberNeurons)
-                it.second.numOutputs = 0
-                it.second.numSelfInputs = 0
-                it.second.numInputsFromSensorsOrOtherNeurons = 0
-
-
-            if conn.sourceType == NEURON and (conn.sourceNum == conn.sinkNum):
-                ++(it.second.numSelfInputs)
-
-            else:
-                ++(it.second.numInputsFromSensorsOrOtherNeurons)
-
-            assert(nodeMap.count(conn.sinkNum) == 1)
-
-        if conn.sourceType == NEURON:
-            it = nodeMap.find(conn.sourceNum)
-            if it == nodeMap.end():
-                assert(conn.sourceNum < p.maxNumberNeurons)
-                nodeMap.insert(std.pair<uint16_t, Node>(conn.sourceNum, {} ))
-                it = nodeMap.find(conn.sourceNum)
-                assert(it.first < p.maxNumberNeurons)
-                it.second.numOutputs = 0
-                it.second.numSelfInputs = 0
-                it.second.numInputsFromSensorsOrOtherNeurons = 0
-
-            ++(it.second.numOutputs)
-            assert(nodeMap.count(conn.sourceNum) == 1)
-
-
-
-
-
-# During the culling process, will remove any neuron that has no outputs,
-# and all the connections that feed the useless neuron.
-def removeConnectionsToNeuron(self, &connections, &nodeMap, neuronNumber):
-    for (itConn = connections.begin(); itConn != connections.end(); )
-        if itConn.sinkType == NEURON and itConn.sinkNum == neuronNumber:
-            # Remove the connection. If the connection source is from another
-            # neuron, decrement the other neuron's numOutputs:
-            if itConn.sourceType == NEURON:
-                --(nodeMap[itConn.sourceNum].numOutputs)
-
-            itConn = connections.erase(itConn)
-
-        else:
-            ++itConn
-
-
-
-
-
-# If a neuron has no outputs or only outputs that feed itself, we
-# remove it along with all connections that feed it. Reiterative, because
-# after we remove a connection to a useless neuron, may result in a
-# different neuron having no outputs.
-def cullUselessNeurons(self, &connections, &nodeMap):
-    allDone = False
-    while (not allDone)
-        allDone = True
-        for (itNeuron = nodeMap.begin(); itNeuron != nodeMap.end(); )
-            assert(itNeuron.first < p.maxNumberNeurons)
-            # We're looking for neurons with zero outputs, neurons that feed itself
-            # and nobody else:
-            if (itNeuron.second.numOutputs == itNeuron.second.numSelfInputs)    # could be 0
-                allDone = False
-                # Find and remove connections from sensors or other neurons
-                removeConnectionsToNeuron(connections, nodeMap, itNeuron.first)
-                itNeuron = nodeMap.erase(itNeuron)
-
-            else:
-                ++itNeuron
-
-
-
-
-
-
-# This function is used when an agent is spawned. This function converts the
-# agent's inherited genome into the agent's neural net brain. There is a close
-# correspondence between the genome and the neural net, a connection
-# specified in the genome will not be represented in the neural net if the
-# connection feeds a neuron that does not itself feed anything else.
-# Neurons get renumbered in the process:
-# 1. Create a set of referenced neuron numbers where each index is in the
-#    range 0..p.genomeMaxLength-1, a count of outputs for each neuron.
-# 2. Delete any referenced neuron index that has no outputs or only feeds itself.
-# 3. Renumber the remaining neurons sequentially starting at 0.
-def createWiringFromGenome(self):
-    NodeMap nodeMap;  # list of neurons and their number of inputs and outputs
-    ConnectionList connectionList; # synaptic connections
-
-    # Convert the indiv's genome to a renumbered connection list
-    makeRenumberedConnectionList(connectionList, genome)
-
-    # Make a node (neuron) list from the renumbered connection list
-    makeNodeList(nodeMap, connectionList)
-
-    # Find and remove neurons that don't feed anything or only feed themself.
-    # This reiteratively removes all connections to the useless neurons.
-    cullUselessNeurons(connectionList, nodeMap)
-
-    # The neurons map now has all the referenced neurons, neuron numbers, and
-    # the number of outputs for each neuron. Now we'll renumber the neurons
-    # starting at zero.
-
-    assert(nodeMap.size() <= p.maxNumberNeurons)
-    newNumber = 0
-    for (auto & node : nodeMap)
-        assert(node.second.numOutputs != 0)
-        node.second.remappedNumber = newNumber++
-
-
-    # Create the indiv's connection list in two passes:
-    # First the connections to neurons, the connections to actions.
-    # This ordering optimizes the feed-forward function in feedForward.cpp.
-
-    nnet.connections.clear()
-
-    # First, connections from sensor or neuron to a neuron
-    for (auto  &conn : connectionList)
-        if conn.sinkType == NEURON:
-            nnet.connections.push_back(conn)
-            auto &newConn = nnet.connections.back()
-            # fix the destination neuron number
-            newConn.sinkNum = nodeMap[newConn.sinkNum].remappedNumber
-            # if the source is a neuron, its number too
-            if newConn.sourceType == NEURON:
-                newConn.sourceNum = nodeMap[newConn.sourceNum].remappedNumber
-
-
-
-
-    # Last, connections from sensor or neuron to an action
-    for (auto  &conn : connectionList)
-        if conn.sinkType == ACTION:
-            nnet.connections.push_back(conn)
-            auto &newConn = nnet.connections.back()
-            # if the source is a neuron, its number
-            if newConn.sourceType == NEURON:
-                newConn.sourceNum = nodeMap[newConn.sourceNum].remappedNumber
-
-
-
-
-    # Create the indiv's neural node list
-    nnet.neurons.clear()
-    for (neuronNum = 0; neuronNum < nodeMap.size(); ++neuronNum)
-        nnet.neurons.push_back( {} )
-        nnet.neurons.back().output = initialNeuronOutput()
-        nnet.neurons.back().driven = (nodeMap[neuronNum].numInputsFromSensorsOrOtherNeurons != 0)
-
-
-
-
-# ---------------------------------------------------------------------------
-
-
-# This applies a point mutation at a random bit in a genome.
-def randomBitFlip(self, &genome):
-    method = 1
-
-    byteIndex = randomUint(0, genome.size() - 1) * sizeof(Gene)
-    elementIndex = randomUint(0, genome.size() - 1)
-    bitIndex8 = 1 << randomUint(0, 7)
-
-    if method == 0:
-        ((uint8_t *)&genome[0])[byteIndex] ^= bitIndex8
-
-    elif method == 1:
-        chance = randomUint() / (float)RANDOM_UINT_MAX; # 0..1
-        if (chance < 0.2)   # sourceType
-            genome[elementIndex].sourceType ^= 1
-
-        elif (chance < 0.4)     # sinkType
-            genome[elementIndex].sinkType ^= 1
-
-        elif (chance < 0.6)     # sourceNum
-            genome[elementIndex].sourceNum ^= bitIndex8
-
-        elif (chance < 0.8)     # sinkNum
-            genome[elementIndex].sinkNum ^= bitIndex8
-
-        else     # weight
-            genome[elementIndex].weight ^= (1 << randomUint(1, 15))
-
-
-    else:
-        assert(False)
-
-
-
-
-# If the genome is longer than the prescribed length, if it's longer
-# than one gene, we remove genes from the front or back. This is
-# used only when the simulator is configured to allow genomes of
-# unequal lengths during a simulation.
-def cropLength(self, &genome, length):
-    if genome.size() > length and length > 0:
-        if randomUint() / (float)RANDOM_UINT_MAX < 0.5:
-            # trim front
-            numberElementsToTrim = genome.size() - length
-            genome.erase(genome.begin(), genome.begin() + numberElementsToTrim)
-
-        else:
-            # trim back
-            genome.erase(genome.end() - (genome.size() - length), genome.end())
-
-
-
-
-
-# Inserts or removes a single gene from the genome. This is
-# used only when the simulator is configured to allow genomes of
-# unequal lengths during a simulation.
-def randomInsertDeletion(self, &genome):
-    probability = p.geneInsertionDeletionRate
-    if randomUint() / (float)RANDOM_UINT_MAX < probability:
-        if randomUint() / (float)RANDOM_UINT_MAX < p.deletionRatio:
-            # deletion
-            if genome.size() > 1:
-                genome.erase(genome.begin() + randomUint(0, genome.size() - 1))
-
-
-        elif genome.size() < p.genomeMaxLength:
-            # insertion
-            #genome.insert(genome.begin() + randomUint(0, genome.size() - 1), makeRandomGene())
-            genome.push_back(makeRandomGene())
-
-
-
-
-
-# This function causes point mutations in a genome with a probability defined
-# by the parameter p.pointMutationRate.
-def applyPointMutations(self, &genome):
-    numberOfGenes = genome.size()
-    while (numberOfGenes-- > 0)
-        if (randomUint() / (float)RANDOM_UINT_MAX) < p.pointMutationRate:
-            randomBitFlip(genome)
-
-
-
-
-
-# This generates a child genome from one or two parent genomes.
-# If the parameter p.sexualReproduction is True, parents contribute
-# genes to the offspring. The genome may undergo mutation.
-# Must be called in single-thread mode between generations
-def generateChildGenome(self, &parentGenomes):
-    # random parent (or parents if sexual reproduction) with random
-    # mutations
-    Genome genome
-
-    uint16_t parent1Idx
-    uint16_t parent2Idx
+# This causes point mutations in the genomes packed in genes, in place, with
+# a probability of p.pointMutationRate per gene. Instead of one random draw
+# per gene, the number of flips of each genome is drawn from the binomial
+# distribution and the flips are scattered over the genome.
+def applyPointMutations(genes, lengths, p, rng):
+    lengths = np.asarray(lengths, dtype=np.int64)
+    counts = rng.binomial(lengths, p.pointMutationRate)
+    genome = np.repeat(np.arange(len(lengths)), counts)
+    randomBitFlips(genes, genomeOffsets(lengths)[genome], lengths[genome], rng)
+
+
+# This generates n child genomes from the parent genomes packed in
+# parentGenes with the specified lengths, returned as (genes, lengths).
+# If the parameter p.sexualReproduction is true, two parents contribute
+# genes to each offspring. The new genomes may undergo mutation.
+def generateChildGenomes(parentGenes, parentLengths, n, p, rng):
+    parentGenes = np.asarray(parentGenes, dtype=GENE_DTYPE)
+    parentLengths = np.asarray(parentLengths, dtype=np.int64)
+    parentOffsets = genomeOffsets(parentLengths)
+    numParents = len(parentLengths)
+    if numParents == 0 or parentLengths.min() == 0:
+        raise ValueError("invalid genome")
 
     # Choose two parents randomly from the candidates. If the parameter
-    # p.chooseParentsByFitness is False, we choose at random from
+    # p.chooseParentsByFitness is false, then we choose at random from
     # all the candidate parents with equal preference. If the parameter is
-    # True, we give preference to candidate parents according to their
-    # score. Their score was computed by the survival/selection algorithm
-    # in survival-criteria.cpp.
-    if p.chooseParentsByFitness and parentGenomes.size() > 1:
-        parent1Idx = randomUint(1, parentGenomes.size() - 1)
-        parent2Idx = randomUint(0, parent1Idx - 1)
-
+    # true, then we give preference to candidate parents according to their
+    # score, i.e. their position in the list: the parents must be sorted by
+    # score, best first (see spawnNewGeneration()).
+    if p.chooseParentsByFitness and numParents > 1:
+        parent1 = rng.integers(1, numParents, size=n)
+        parent2 = rng.integers(0, parent1)
     else:
-        parent1Idx = randomUint(0, parentGenomes.size() - 1)
-        parent2Idx = randomUint(0, parentGenomes.size() - 1)
-
-
-     Genome &g1 = parentGenomes[parent1Idx]
-     Genome &g2 = parentGenomes[parent2Idx]
-
-    if g1.size() == 0 or g2.size() == 0:
-        std.cout << "invalid genome" << std.endl
-        assert(False)
-
-
-    overlayWithSliceOf = [&]( Genome &gShorter)
-        index0 = randomUint(0, gShorter.size() - 1)
-        index1 = randomUint(0, gShorter.size())
-        if index0 > index1:
-            std.swap(index0, index1)
-
-        std.copy(&gShorter[index0], &gShorter[index1], &genome[index0])
-
+        parent1 = rng.integers(0, numParents, size=n)
+        parent2 = rng.integers(0, numParents, size=n)
+    length1, length2 = parentLengths[parent1], parentLengths[parent2]
 
     if p.sexualReproduction:
-        if g1.size() > g2.size():
-            genome = g1
-            overlayWithSliceOf(g2)
-            assert(genome.size() > 0)
-
-        else:
-            genome = g2
-            overlayWithSliceOf(g1)
-            assert(genome.size() > 0)
-
-
-        # Trim length = average length of parents
-        sum = g1.size() + g2.size()
-        # If average length is not an integral number, one half the time
-        if (sum & 1) and (randomUint() & 1):
-            ++sum
-
-        cropLength(genome, sum / 2)
-        assert(genome.size() > 0)
-
+        # The longer parent is copied and overlaid with a slice of the shorter one
+        firstIsLonger = length1 > length2
+        longer = np.where(firstIsLonger, parent1, parent2)
+        shorter = np.where(firstIsLonger, parent2, parent1)
+        shorterLength = parentLengths[shorter]
+        index0 = rng.integers(0, shorterLength)
+        index1 = rng.integers(0, shorterLength + 1)
+        index0, index1 = np.minimum(index0, index1), np.maximum(index0, index1)
+
+        # Trim to length = average length of parents, from the front or the back.
+        # If average length is not an integral number, add one half the time
+        total = length1 + length2
+        total += (total & 1) & rng.integers(0, 2, size=n)
+        longerLength = parentLengths[longer]
+        trim = np.maximum(longerLength - total // 2, 0)
+        start = np.where(rng.random(n) < 0.5, trim, 0)
+        length = longerLength - trim
     else:
-        genome = g2
-        assert(genome.size() > 0)
-
-
-    randomInsertDeletion(genome)
-    assert(genome.size() > 0)
-    applyPointMutations(genome)
-    assert(genome.size() > 0)
-    assert(genome.size() <= p.genomeMaxLength)
-
-    return genome
-
-
-} # end namespace BS
+        longer = shorter = parent2
+        index0 = index1 = np.zeros(n, dtype=np.int64)
+        start = np.zeros(n, dtype=np.int64)
+        length = length2
+
+    # Inserts or removes a single gene, see randomInsertDeletion() in genome.cpp
+    insertDeletion = rng.random(n) < p.geneInsertionDeletionRate
+    isDeletion = rng.random(n) < p.deletionRatio
+    deletion = insertDeletion & isDeletion & (length > 1)
+    insertion = insertDeletion & ~isDeletion & (length < p.genomeMaxLength)
+    deletionIndex = rng.integers(0, length)
+    lengths = length - deletion + insertion
+
+    # Position k of a child is position start + k of the longer parent,
+    # shifted past the deleted gene; an inserted gene is appended at the end
+    child = np.repeat(np.arange(n), lengths)
+    k = np.arange(len(child)) - genomeOffsets(lengths)[child]
+    k += deletion[child] & (k >= deletionIndex[child])
+    inserted = insertion[child] & (k == length[child])
+    k += start[child]
+    overlaid = (k >= index0[child]) & (k < index1[child])
+    source = np.where(overlaid, parentOffsets[shorter[child]], parentOffsets[longer[child]]) + k
+
+    genes = parentGenes[np.where(inserted, 0, source)]
+    genes[inserted] = makeRandomGenes(rng, np.count_nonzero(inserted))
+    applyPointMutations(genes, lengths, p, rng)
+    return genes, lengths
+
+
+# ------------------------------ Wiring compiler ------------------------------
+#
+# This converts genomes into the neural net brains of the individuals, for
+# any number of genomes at once. There is a close correspondence between the
+# genome and the neural net, but a connection specified in the genome will
+# not be represented in the neural net if the connection feeds a neuron
+# that does not itself feed anything else. See
+# Indiv::createWiringFromGenome() in genome.cpp for the steps; here each
+# step is done for all the genes of all the genomes with array operations:
+#
+# 1. Renumber the sources and sinks with a modulo: neurons to the range
+#    0..p.maxNumberNeurons - 1, sensors to 0..NUM_SENSES - 1 and actions to
+#    0..NUM_ACTIONS - 1. Every neuron of every genome gets a node key
+#    genome * p.maxNumberNeurons + neuron.
+# 2. Count the inputs and outputs of every node with np.bincount().
+# 3. Cull the neurons that have no outputs or only feed themselves, along
+#    with the connections that feed them. Removing those may leave other
+#    neurons without outputs, so repeat until nothing changes. The neurons
+#    all get culled at once in each round; the result doesn't depend on the
+#    order in which they're removed.
+# 4. Renumber the remaining neurons sequentially starting at 0.
+# 5. Order each genome's connections: first the connections to neurons,
+#    then the connections to actions, as feedForward() expects.
+
+# Returns the NeuralNets of the genomes packed in genes with the specified
+# lengths (see packGenomes()), in the same order.
+def createWiringFromGenomes(genes, lengths, p):
+    genes = np.asarray(genes, dtype=GENE_DTYPE)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    numGenomes = len(lengths)
+    maxNeurons = p.maxNumberNeurons
+    genomeNum = np.repeat(np.arange(numGenomes), lengths)
+
+    # 1. Renumbered connection list
+    srcType, snkType = sourceType(genes), sinkType(genes)
+    srcIsNeuron, snkIsNeuron = srcType == NEURON, snkType == NEURON
+    srcNum = np.where(srcIsNeuron, sourceNum(genes) % maxNeurons, sourceNum(genes) % NUM_SENSES)
+    snkNum = np.where(snkIsNeuron, sinkNum(genes) % maxNeurons, sinkNum(genes) % NUM_ACTIONS)
+    # Sensors and actions get the key 0, they're always masked out below
+    srcKey = np.where(srcIsNeuron, genomeNum * maxNeurons + srcNum, 0)
+    snkKey = np.where(snkIsNeuron, genomeNum * maxNeurons + snkNum, 0)
+
+    # 2. Node list
+    numKeys = numGenomes * maxNeurons
+    isSelf = srcIsNeuron & snkIsNeuron & (srcNum == snkNum)
+    numSelfInputs = np.bincount(snkKey[isSelf], minlength=numKeys)
+    numInputsFromSensorsOrOtherNeurons = np.bincount(snkKey[snkIsNeuron & ~isSelf], minlength=numKeys)
+    present = ((np.bincount(snkKey[snkIsNeuron], minlength=numKeys) > 0)
+               | (np.bincount(srcKey[srcIsNeuron], minlength=numKeys) > 0))
+
+    # 3. Cull useless neurons
+    live = np.ones(len(genes), dtype=np.bool_)
+    while True:
+        numOutputs = np.bincount(srcKey[live & srcIsNeuron], minlength=numKeys)
+        useless = present & (numOutputs == numSelfInputs)  # could be 0
+        if not useless.any():
+            break
+        present &= ~useless
+        live &= ~(snkIsNeuron & useless[snkKey])
+
+    # 4. Remap the neuron numbers
+    present = present.reshape(numGenomes, maxNeurons)
+    remappedNumber = (np.cumsum(present, axis=1) - 1).ravel()
+    srcNum = np.where(srcIsNeuron, remappedNumber[srcKey], srcNum)
+    snkNum = np.where(snkIsNeuron, remappedNumber[snkKey], snkNum)
+    # Each neuron's driven flag comes from its own node. genome.cpp builds
+    # the neuron list with nodeMap[neuronNum], indexing by the new number
+    # although the map is keyed by the old one: that reads the wrong node
+    # (or inserts an empty one, growing the map and the neuron list), so
+    # the wrong neurons become constant bias feeds. This is a deliberate fix.
+    driven = numInputsFromSensorsOrOtherNeurons.reshape(numGenomes, maxNeurons)[present] != 0
+
+    # 5. Connections to neurons first, then to actions, genome by genome
+    order = np.flatnonzero(live)
+    order = order[np.lexsort((snkType[order] == ACTION, genomeNum[order]))]
+    connectionSplits = np.cumsum(np.bincount(genomeNum[order], minlength=numGenomes))[:-1]
+    neuronSplits = np.cumsum(present.sum(axis=1))[:-1]
+
+    fields = [np.split(field[order], connectionSplits) for field in (srcType, srcNum, snkType, snkNum)]
+    fields.append(np.split(weight(genes)[order], connectionSplits))
+    fields.append(np.split(driven, neuronSplits))
+    return [NeuralNet(*net) for net in zip(*fields)]
+
+
+# Returns the NeuralNet of one genome
+def createWiringFromGenome(genome, p):
+    return createWiringFromGenomes(genome, [len(genome)], p)[0]
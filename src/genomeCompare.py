@@ -0,0 +1,246 @@
+# genomeCompare.py -- compute similarity of genomes
+#
+# See genome-compare.cpp for the one-pair-at-a-time C++ version. Here the
+# genomes are compared in batches of pairs straight from a packed genome
+# buffer (see genome.packGenomes()): each batch of genomes is gathered into
+# a zero-padded matrix with one row per genome, and the comparison is done
+# for all the pairs of the batch with array operations. Batches are sized so
+# that a gathered matrix holds about _BLOCK_GENES genes.
+#
+# Two genes match when all their fields are equal (genesMatch() in
+# genome-compare.cpp), which for packed genes is just equality of the uint32
+# values.
+#
+# The similarity method is selected by p.genomeComparisonMethod:
+#     0  Jaro-Winkler, tolerant of gaps, relocations and unequal lengths
+#     1  Hamming distance bit by bit
+#     2  Hamming distance gene by gene
+
+import numpy as np
+
+from src.basicTypes import countBits
+from src.genome import GENE_DTYPE, genomeOffsets
+
+_BLOCK_GENES = 1 << 22
+
+
+# Returns the genomes at offsets with the specified lengths as the rows of a
+# (len(offsets), width) matrix, padded with zero genes
+def _gather(genes, offsets, lengths, width):
+    position = np.arange(width)
+    inGenome = position < lengths[:, None]
+    index = np.where(inGenome, offsets[:, None] + position, 0)
+    return np.where(inGenome, genes[index], GENE_DTYPE(0)) if len(genes) else np.zeros(index.shape, GENE_DTYPE)
+
+
+# The jaroWinkler() function is adapted from jaro_winkler_distance() in
+# genome-compare.cpp, itself adapted from the C version at
+# https://github.com/miguelvps/c/blob/master/jarowinkler.c
+# under a GNU license, ver. 3. The C++ version only looks at the first 20
+# genes of long genomes; this one compares the whole genomes. The matching
+# pass keeps the C version's greedy order: gene i of a takes the first
+# unflagged matching gene of s within range of i. It is done one position
+# of a at a time for all the pairs of the batch.
+def jaroWinkler(s, sLengths, a, aLengths):
+    sLengths = sLengths.astype(np.int64)
+    aLengths = aLengths.astype(np.int64)
+    numPairs = len(sLengths)
+    matchRange = np.maximum(0, np.maximum(sLengths, aLengths) // 2 - 1)
+    sPosition = np.arange(s.shape[1])
+    sFlags = np.zeros(s.shape, dtype=np.bool_)
+    aFlags = np.zeros(a.shape, dtype=np.bool_)
+
+    # calculate matching genes
+    for i in range(a.shape[1]):
+        low = np.maximum(i - matchRange, 0)
+        high = np.minimum(i + matchRange + 1, sLengths)
+        candidates = ((sPosition >= low[:, None]) & (sPosition < high[:, None]) & ~sFlags
+                      & (s == a[:, i:i + 1]) & (i < aLengths)[:, None])
+        matched = np.flatnonzero(candidates.any(axis=1))
+        sFlags[matched, candidates[matched].argmax(axis=1)] = True
+        aFlags[matched, i] = True
+    m = aFlags.sum(axis=1)
+
+    # calculate gene transpositions: the k-th matched gene of a against the
+    # k-th matched gene of s
+    width = min(s.shape[1], a.shape[1])
+    sMatched = np.take_along_axis(s, np.argsort(~sFlags, axis=1, kind="stable"), axis=1)[:, :width]
+    aMatched = np.take_along_axis(a, np.argsort(~aFlags, axis=1, kind="stable"), axis=1)[:, :width]
+    t = ((sMatched != aMatched) & (np.arange(width) < m[:, None])).sum(axis=1) // 2
+
+    # Jaro distance
+    similarity = np.zeros(numPairs)
+    ok = m > 0
+    m, t = m[ok].astype(np.float64), t[ok]
+    similarity[ok] = (m / sLengths[ok] + m / aLengths[ok] + (m - t) / m) / 3.0
+    return similarity
+
+
+# The Hamming measures work only for genomes of equal length; genomes of
+# unequal lengths are compared over the length of the shorter one. Both
+# take the genomes as rows of padded matrices of the same width, or any
+# arrays of rows that broadcast together, e.g. shapes (b, 1, width) and
+# (1, n, width) with lengths (b, 1) and (1, n) to compare b genomes with n.
+def _commonLength(g1, lengths1, g2, lengths2):
+    length = np.minimum(lengths1, lengths2).astype(np.int64)
+    width = g1.shape[-1]
+    # The positions past the common length only need masking if there are any
+    inGenome = None if np.all(length == width) else np.arange(width) < length[..., None]
+    return length, inGenome
+
+
+def hammingDistanceBits(g1, lengths1, g2, lengths2):
+    length, inGenome = _commonLength(g1, lengths1, g2, lengths2)
+    bitCounts = countBits(g1 ^ g2)
+    if inGenome is not None:
+        bitCounts &= np.where(inGenome, np.uint8(0xff), np.uint8(0))
+    bitCount = bitCounts.sum(axis=-1, dtype=np.int64)
+    lengthBits = np.maximum(length * 32, 1)
+
+    # For two completely random bit patterns, about half the bits will differ,
+    # resulting in c. 50% match. We will scale that by 2X to make the range
+    # from 0 to 1.0. We clip the value to 1.0 in case the two patterns are
+    # negatively correlated for some reason.
+    return 1.0 - np.minimum(1.0, (2.0 * bitCount) / lengthBits)
+
+
+# As in genome-compare.cpp, the count of matching genes is divided by the
+# length in bytes, so identical genomes score 0.25.
+def hammingDistanceBytes(g1, lengths1, g2, lengths2):
+    length, inGenome = _commonLength(g1, lengths1, g2, lengths2)
+    matches = g1 == g2
+    if inGenome is not None:
+        matches &= inGenome
+    geneCount = matches.sum(axis=-1)
+    return geneCount / np.maximum(length * 4, 1).astype(np.float64)
+
+
+_METHODS = {
+    0: jaroWinkler,
+    1: hammingDistanceBits,
+    2: hammingDistanceBytes,
+}
+
+
+# Returns the similarities 0.0..1.0 of the genome pairs (index0[k],
+# index1[k]) of the genomes packed in genes at the specified offsets with
+# the specified lengths, using the comparison method (see above).
+def pairSimilarity(genes, offsets, lengths, index0, index1, method):
+    compare = _METHODS.get(method)
+    if compare is None:
+        raise ValueError("Unknown genomeComparisonMethod {}".format(method))
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    index0 = np.asarray(index0, dtype=np.intp)
+    index1 = np.asarray(index1, dtype=np.intp)
+    similarity = np.zeros(len(index0))
+    if len(index0) == 0:
+        return similarity
+
+    width = int(lengths.max())
+    batch = max(1, _BLOCK_GENES // max(width, 1))
+    for start in range(0, len(index0), batch):
+        i0, i1 = index0[start:start + batch], index1[start:start + batch]
+        g1 = _gather(genes, offsets[i0], lengths[i0], width)
+        g2 = _gather(genes, offsets[i1], lengths[i1], width)
+        similarity[start:start + batch] = compare(g1, lengths[i0], g2, lengths[i1])
+    return similarity
+
+
+# Returns 0.0..1.0, the similarity of two genomes
+def genomeSimilarity(g1, g2, method):
+    genes = np.concatenate([g1, g2]).astype(GENE_DTYPE, copy=False)
+    return float(pairSimilarity(genes, [0, len(g1)], [len(g1), len(g2)], [0], [1], method)[0])
+
+
+# Returns the (len(lengths0), len(lengths1)) matrix of the similarities of
+# each of the genomes packed in genes0 with each of those packed in genes1,
+# a block of rows at a time.
+def similarityMatrix(genes0, lengths0, genes1, lengths1, method):
+    lengths0 = np.asarray(lengths0, dtype=np.int64)
+    lengths1 = np.asarray(lengths1, dtype=np.int64)
+    n0, n1 = len(lengths0), len(lengths1)
+    similarity = np.zeros((n0, n1))
+    if n0 == 0 or n1 == 0:
+        return similarity
+
+    width = max(int(lengths0.max()), int(lengths1.max()), 1)
+    if method in (1, 2):
+        compare = _METHODS[method]
+        matrix0 = _gather(genes0, genomeOffsets(lengths0), lengths0, width)
+        matrix1 = _gather(genes1, genomeOffsets(lengths1), lengths1, width)
+        blockRows = max(1, _BLOCK_GENES // (n1 * width))
+        for row in range(0, n0, blockRows):
+            end = min(row + blockRows, n0)
+            similarity[row:end] = compare(matrix0[row:end, None], lengths0[row:end, None],
+                                          matrix1[None], lengths1[None])
+    else:
+        genes = np.concatenate([genes0, genes1]).astype(GENE_DTYPE, copy=False)
+        lengths = np.concatenate([lengths0, lengths1])
+        offsets = genomeOffsets(lengths)
+        blockRows = max(1, _BLOCK_GENES // (n1 * width))
+        for row in range(0, n0, blockRows):
+            end = min(row + blockRows, n0)
+            index0, index1 = np.divmod(np.arange(row * n1, end * n1), n1)
+            similarity[row:end] = pairSimilarity(genes, offsets, lengths, index0, n0 + index1,
+                                                 method).reshape(end - row, n1)
+    return similarity
+
+
+# Yields the pairs (i, j), i < j, of n genomes as (index0, index1) arrays
+# of about blockSize pairs, a range of rows i at a time. Used for
+# Jaro-Winkler, whose matching pass needs the pairs listed.
+def _allPairs(n, blockSize):
+    row = 0
+    while row < n - 1:
+        end = row + 1
+        count = n - 1 - row
+        while end < n - 1 and count + (n - 1 - end) <= blockSize:
+            count += n - 1 - end
+            end += 1
+        rows = np.arange(row, end)
+        perRow = n - 1 - rows
+        index0 = np.repeat(rows, perRow)
+        index1 = np.arange(len(index0)) - np.repeat(genomeOffsets(perRow), perRow) + index0 + 1
+        yield index0, index1
+        row = end
+
+
+# Returns 0.0..1.0, the genetic diversity of the genomes packed in genes with
+# the specified lengths: one minus their average pairwise similarity. With
+# sampleSize 0 every pair is compared; otherwise sampleSize pairs of
+# neighboring genomes are drawn at random, as geneticDiversity() in
+# genome-compare.cpp does.
+def geneticDiversity(genes, lengths, method, sampleSize, rng):
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n = len(lengths)
+    if n < 2:
+        return 0.0
+
+    offsets = genomeOffsets(lengths)
+    width = max(int(lengths.max()), 1)
+    if sampleSize == 0 and method in (1, 2):
+        # All the genomes in one matrix, compared a block of rows against
+        # the rows below at a time; only the pairs i < j are summed
+        compare = _METHODS[method]
+        matrix = _gather(genes, offsets, lengths, width)
+        similaritySum = 0.0
+        blockRows = max(1, _BLOCK_GENES // (n * width))
+        for row in range(0, n - 1, blockRows):
+            end = min(row + blockRows, n - 1)
+            similarity = compare(matrix[row:end, None], lengths[row:end, None],
+                                 matrix[None, row:], lengths[None, row:])
+            similaritySum += np.triu(similarity, k=1).sum()
+        numSamples = n * (n - 1) // 2
+    elif sampleSize == 0:
+        similaritySum = 0.0
+        for index0, index1 in _allPairs(n, _BLOCK_GENES // width):
+            similaritySum += pairSimilarity(genes, offsets, lengths, index0, index1, method).sum()
+        numSamples = n * (n - 1) // 2
+    else:
+        index0 = rng.integers(0, n - 1, size=sampleSize)
+        similaritySum = pairSimilarity(genes, offsets, lengths, index0, index0 + 1, method).sum()
+        numSamples = sampleSize
+
+    return 1.0 - similaritySum / numSamples
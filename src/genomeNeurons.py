@@ -0,0 +1,57 @@
+# genomeNeurons.py
+#
+# Genes, genomes and neural nets. See genome-neurons.h for notes.
+
+import numpy as np
+
+# Each gene specifies one synaptic connection in a neural net. Each
+# connection has an input (source) which is either a sensor or another neuron.
+# Each connection has an output, which is either an action or another neuron.
+# Each connection has a floating point weight derived from a signed 16-bit
+# value.
+SENSOR = 1  # always a source
+ACTION = 1  # always a sink
+NEURON = 0  # can be either a source or sink
+
+
+# When a new population is generated and every individual is given a
+# neural net, the neuron outputs must be initialized to something:
+def initialNeuronOutput():
+    return 0.5
+
+
+def weightAsFloat(weight):
+    return weight / 8192.0
+
+
+# An individual's "brain" is a neural net specified by a set
+# of Genes where each Gene specifies one connection in the neural net.
+# There is no concept of layers in the net: it's a free-for-all topology
+# with forward, backwards, and sideways connection allowed.
+#
+# The connections are kept as parallel arrays, ordered so that all the
+# connections to neurons come before the connections to actions, with the
+# neurons renumbered sequentially starting at 0. driven[n] is False for
+# neurons without inputs from sensors or other neurons; those keep a fixed
+# output. A NeuralNet is immutable once built so it can be shared between
+# individuals with identical genomes.
+class NeuralNet:
+    """ Wiring of one individual's brain"""
+
+    __slots__ = ("sourceType", "sourceNum", "sinkType", "sinkNum", "weight", "driven")
+
+    def __init__(self, sourceType, sourceNum, sinkType, sinkNum, weight, driven):
+        self.sourceType = np.array(sourceType, dtype=np.uint8)
+        self.sourceNum = np.array(sourceNum, dtype=np.uint16)
+        self.sinkType = np.array(sinkType, dtype=np.uint8)
+        self.sinkNum = np.array(sinkNum, dtype=np.uint16)
+        self.weight = np.array(weight, dtype=np.int16)
+        self.driven = np.array(driven, dtype=np.bool_)
+        for name in self.__slots__:
+            getattr(self, name).flags.writeable = False
+
+    def numConnections(self):
+        return self.weight.size
+
+    def numNeurons(self):
+        return self.driven.size
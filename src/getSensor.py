@@ -0,0 +1,330 @@
+# getSensor.py
+#
+# Computes the sensor values of the whole population once per simStep.
+#
+# getSensor.cpp evaluates one sensor for one individual every time a
+# connection reads it, so a sensor read by several connections is recomputed
+# for each of them. Here computeAllSensors() produces a matrix with one row
+# per individual and one column per sensor, computed once per simStep and
+# only for the sensors referenced by some neural net. The feed-forward then
+# just reads its inputs from this matrix.
+#
+# The sensors that look around an agent (neighborhood densities, probes)
+# sample whole-grid fields that updateFields() computes once per simStep,
+# instead of walking the grid from every agent.
+#
+# Returned sensor values range SENSOR_MIN..SENSOR_MAX
+
+import numpy as np
+
+from src.basicTypes import NORMALIZED_X, NORMALIZED_Y, ROTATE_90_CW, ROTATE_180, Compass
+from src.genomeCompare import pairSimilarity
+from src.grid import EMPTY, BARRIER, probeSteps
+from src.neighborhood import discSum, discCount, directionalSum
+from src.sensorsActions import Sensor, NUM_SENSES
+from src.signals import SIGNAL_MAX
+
+# --------------- Sensors computed for all individuals at once ---------------
+#
+# Each of these takes the Sensors stage and the range of rows lo..hi and
+# returns one value per row.
+
+def _locX(s, simStep, lo, hi):
+    # Maps current X location 0..p.sizeX-1 to sensor range 0.0..1.0
+    return s.peeps.locX[lo:hi] / (s.p.sizeX - 1)
+
+
+def _locY(s, simStep, lo, hi):
+    # Maps current Y location 0..p.sizeY-1 to sensor range 0.0..1.0
+    return s.peeps.locY[lo:hi] / (s.p.sizeY - 1)
+
+
+def _boundaryDist(s, simStep, lo, hi):
+    # Finds closest boundary, compares that to the max possible dist
+    # to a boundary from the center, and converts that linearly to the
+    # sensor range 0.0..1.0
+    x = s.peeps.locX[lo:hi].astype(np.int32)
+    y = s.peeps.locY[lo:hi].astype(np.int32)
+    distX = np.minimum(x, (s.p.sizeX - x) - 1)
+    distY = np.minimum(y, (s.p.sizeY - y) - 1)
+    closest = np.minimum(distX, distY)
+    maxPossible = max(s.p.sizeX // 2 - 1, s.p.sizeY // 2 - 1)
+    return closest / maxPossible
+
+
+def _boundaryDistX(s, simStep, lo, hi):
+    # Measures the distance to nearest boundary in the east-west axis,
+    # max distance is half the grid width; scaled to sensor range 0.0..1.0.
+    x = s.peeps.locX[lo:hi].astype(np.int32)
+    return np.minimum(x, (s.p.sizeX - x) - 1) / (s.p.sizeX / 2.0)
+
+
+def _boundaryDistY(s, simStep, lo, hi):
+    # Measures the distance to nearest boundary in the south-north axis,
+    # max distance is half the grid height; scaled to sensor range 0.0..1.0.
+    y = s.peeps.locY[lo:hi].astype(np.int32)
+    return np.minimum(y, (s.p.sizeY - y) - 1) / (s.p.sizeY / 2.0)
+
+
+def _lastMoveDirX(s, simStep, lo, hi):
+    # X component -1, 0, 1 maps to sensor values 0.0, 0.5, 1.0
+    return (NORMALIZED_X[s.peeps.lastMoveDir[lo:hi]] + 1) / 2.0
+
+
+def _lastMoveDirY(s, simStep, lo, hi):
+    # Y component -1, 0, 1 maps to sensor values 0.0, 0.5, 1.0
+    return (NORMALIZED_Y[s.peeps.lastMoveDir[lo:hi]] + 1) / 2.0
+
+
+def _age(s, simStep, lo, hi):
+    # Converts age (units of simSteps compared to life expectancy)
+    # linearly to normalized sensor range 0.0..1.0
+    return s.peeps.age[lo:hi] / s.p.stepsPerGeneration
+
+
+def _osc1(s, simStep, lo, hi):
+    # Maps the oscillator sine wave to sensor range 0.0..1.0;
+    # cycles starts at simStep 0 for everbody.
+    oscPeriod = np.maximum(s.peeps.oscPeriod[lo:hi], 1)
+    phase = (simStep % oscPeriod) / oscPeriod  # 0.0..1.0
+    factor = -np.cos(phase * 2.0 * np.pi)
+    factor += 1.0    # convert to 0.0..2.0
+    factor /= 2.0    # convert to 0.0..1.0
+    # Clip any round-off error
+    return np.clip(factor, 0.0, 1.0)
+
+
+def _random(s, simStep, lo, hi):
+    # Returns a random sensor value in the range 0.0..1.0.
+    return s.rng.random(np.arange(lo, hi))
+
+
+def _population(s, simStep, lo, hi):
+    # Returns population density in neighborhood converted linearly from
+    # 0..100% to sensor range
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    return s.fields["populationCount"][x, y] / s.fields["populationLocs"][x, y]
+
+
+def _signal0(s, simStep, lo, hi):
+    # Returns magnitude of signal0 in the local neighborhood, with
+    # 0.0..maxSignalSum converted to sensorRange 0.0..1.0
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    maxSum = s.fields["signalLocs"][x, y].astype(np.float64) * SIGNAL_MAX
+    return s.fields["signal0Sum"][x, y] / maxSum
+
+
+# Converts the population along the specified axis to the sensor range. The
+# locations of neighbors are scaled by the inverse of their distance times
+# the positive absolute cosine of the difference of their angle and the
+# specified axis. The maximum positive or negative magnitude of the sum is
+# about 2*radius. We don't adjust for being close to a border, so populations
+# along borders and in corners are commonly sparser than away from borders.
+# An empty neighborhood results in a sensor value exactly midrange; below
+# midrange if the population density is greatest in the reverse direction,
+# above midrange if density is greatest in forward direction.
+def _populationAlongAxis(s, lo, hi, dir):
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    maxSumMag = 6.0 * s.p.populationSensorRadius
+    sensorVal = s.fields["populationAxis"][dir, x, y] / maxSumMag  # convert to -1.0..1.0
+    return (sensorVal + 1.0) / 2.0  # convert to 0.0..1.0
+
+
+# Converts the signal density along the specified axis to sensor range. The
+# values of cell signal levels are scaled by the inverse of their distance times
+# the positive absolute cosine of the difference of their angle and the
+# specified axis. The maximum positive or negative magnitude of the sum is
+# about 2*radius*SIGNAL_MAX (?). We don't adjust for being close to a border,
+# so signal densities along borders and in corners are commonly sparser than
+# away from borders.
+#
+# Unlike getSensor.cpp, each cell is weighed by its own signal level rather
+# than by the level at loc.
+def _signal0AlongAxis(s, lo, hi, dir):
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    maxSumMag = 6.0 * s.p.signalSensorRadius * SIGNAL_MAX
+    sensorVal = s.fields["signal0Axis"][dir, x, y] / maxSumMag  # convert to -1.0..1.0
+    return (sensorVal + 1.0) / 2.0  # convert to 0.0..1.0
+
+
+def _populationFwd(s, simStep, lo, hi):
+    # Sense population density along axis of last movement direction, mapped
+    # to sensor range 0.0..1.0
+    return _populationAlongAxis(s, lo, hi, s.peeps.lastMoveDir[lo:hi])
+
+
+def _populationLR(s, simStep, lo, hi):
+    # Sense population density along an axis 90 degrees from last movement direction
+    return _populationAlongAxis(s, lo, hi, ROTATE_90_CW[s.peeps.lastMoveDir[lo:hi]])
+
+
+def _signal0Fwd(s, simStep, lo, hi):
+    # Sense signal0 density along axis of last movement direction
+    return _signal0AlongAxis(s, lo, hi, s.peeps.lastMoveDir[lo:hi])
+
+
+def _signal0LR(s, simStep, lo, hi):
+    # Sense signal0 density along an axis perpendicular to last movement direction
+    return _signal0AlongAxis(s, lo, hi, ROTATE_90_CW[s.peeps.lastMoveDir[lo:hi]])
+
+
+# The probes below look up how many steps away the first barrier or agent is
+# in the probe direction, see probeSteps(). A probe of probeDistance
+# locations that reaches the border first finds nothing, which counts as
+# probeDistance, the same as reaching the end of the probe.
+def _probeCount(steps, dir, x, y, probeDistance):
+    return np.minimum(steps[dir, x, y].astype(np.int64) - 1, probeDistance)
+
+
+# Converts the number of locations (not including loc) to the next barrier location
+# along opposite directions of the specified axis to the sensor range. If no barriers
+# are found, the result is sensor mid-range. Ignores agents in the path.
+def _shortProbeBarrierDistance(s, lo, hi, dir):
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    probeDistance = s.p.shortProbeBarrierDistance
+    countFwd = _probeCount(s.grid.barrierSteps, dir, x, y, probeDistance)
+    countRev = _probeCount(s.grid.barrierSteps, ROTATE_180[dir], x, y, probeDistance)
+    sensorVal = (countFwd - countRev) + probeDistance  # convert to 0..2*probeDistance
+    return (sensorVal / 2.0) / probeDistance  # convert to 0.0..1.0
+
+
+def _barrierFwd(s, simStep, lo, hi):
+    # Sense the nearest barrier along axis of last movement direction, mapped
+    # to sensor range 0.0..1.0
+    return _shortProbeBarrierDistance(s, lo, hi, s.peeps.lastMoveDir[lo:hi])
+
+
+def _barrierLR(s, simStep, lo, hi):
+    # Sense the nearest barrier along axis perpendicular to last movement direction, mapped
+    # to sensor range 0.0..1.0
+    return _shortProbeBarrierDistance(s, lo, hi, ROTATE_90_CW[s.peeps.lastMoveDir[lo:hi]])
+
+
+def _longProbePopFwd(s, simStep, lo, hi):
+    # Measures the distance to the nearest other individual in the
+    # forward direction. If none found, the maximum sensor value.
+    # Maps the result to the sensor range 0.0..1.0.
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    longProbeDist = np.maximum(s.peeps.longProbeDist[lo:hi], 1)
+    count = _probeCount(s.fields["occupantSteps"], s.peeps.lastMoveDir[lo:hi], x, y, longProbeDist)
+    return count / longProbeDist
+
+
+def _longProbeBarFwd(s, simStep, lo, hi):
+    # Measures the distance to the nearest barrier in the forward
+    # direction. If none found, the maximum sensor value.
+    # Maps the result to the sensor range 0.0..1.0.
+    x, y = s.peeps.locX[lo:hi], s.peeps.locY[lo:hi]
+    longProbeDist = np.maximum(s.peeps.longProbeDist[lo:hi], 1)
+    count = _probeCount(s.grid.barrierSteps, s.peeps.lastMoveDir[lo:hi], x, y, longProbeDist)
+    return count / longProbeDist
+
+
+def _geneticSimFwd(s, simStep, lo, hi):
+    # Return minimum sensor value if nobody is alive in the forward adjacent location,
+    # else returns a similarity match in the sensor range 0.0..1.0
+    dir = s.peeps.lastMoveDir[lo:hi]
+    x = s.peeps.locX[lo:hi] + NORMALIZED_X[dir]
+    y = s.peeps.locY[lo:hi] + NORMALIZED_Y[dir]
+    sensorVal = np.zeros(hi - lo)
+    inBounds = np.flatnonzero(s.grid.isInBounds(x, y))
+    other = s.grid.data[x[inBounds], y[inBounds]]
+    occupied = (other != EMPTY) & (other != BARRIER)
+    inBounds, other = inBounds[occupied], other[occupied].astype(np.intp)
+    alive = s.peeps.alive[other]
+    rows, other = inBounds[alive], other[alive]
+    sensorVal[rows] = pairSimilarity(s.peeps.genes, s.peeps.genomeOffset, s.peeps.genomeLength,
+                                     lo + rows, other, s.p.genomeComparisonMethod)
+    return sensorVal
+
+
+_SENSOR_FUNCTIONS = {
+    Sensor.LOC_X: _locX,
+    Sensor.LOC_Y: _locY,
+    Sensor.BOUNDARY_DIST_X: _boundaryDistX,
+    Sensor.BOUNDARY_DIST: _boundaryDist,
+    Sensor.BOUNDARY_DIST_Y: _boundaryDistY,
+    Sensor.LAST_MOVE_DIR_X: _lastMoveDirX,
+    Sensor.LAST_MOVE_DIR_Y: _lastMoveDirY,
+    Sensor.AGE: _age,
+    Sensor.OSC1: _osc1,
+    Sensor.RANDOM: _random,
+    Sensor.POPULATION: _population,
+    Sensor.SIGNAL0: _signal0,
+    Sensor.POPULATION_FWD: _populationFwd,
+    Sensor.POPULATION_LR: _populationLR,
+    Sensor.SIGNAL0_FWD: _signal0Fwd,
+    Sensor.SIGNAL0_LR: _signal0LR,
+    Sensor.LONGPROBE_POP_FWD: _longProbePopFwd,
+    Sensor.LONGPROBE_BAR_FWD: _longProbeBarFwd,
+    Sensor.BARRIER_FWD: _barrierFwd,
+    Sensor.BARRIER_LR: _barrierLR,
+    Sensor.GENETIC_SIM_FWD: _geneticSimFwd,
+}
+
+
+class Sensors:
+    """ Per-simStep sensor stage for the whole population"""
+
+    def __init__(self, p, peeps, grid, signals):
+        self.p = p
+        self.peeps = peeps
+        self.grid = grid
+        self.signals = signals
+        self.rng = None
+        # Sensors referenced by any neural net, see NeuralNetBatch.sensorsInUse()
+        self.sensorsInUse = np.ones(NUM_SENSES, dtype=np.bool_)
+        # Whole-grid fields sampled by the sensors, see updateFields()
+        self.fields = {}
+
+    def setSensorsInUse(self, sensorsInUse):
+        self.sensorsInUse = np.asarray(sensorsInUse, dtype=np.bool_)
+
+    # Computes the whole-grid fields read by the sensors in use.
+    # Must be called once at the start of each simStep, before
+    # computeAllSensors(), because they depend on where everybody is.
+    def updateFields(self):
+        p = self.p
+        occupied = self.grid.occupiedMask()
+        fields = {}
+        if self.sensorsInUse[Sensor.POPULATION]:
+            fields["populationCount"] = discSum(occupied, p.populationSensorRadius)
+            fields["populationLocs"] = discCount(p.sizeX, p.sizeY, p.populationSensorRadius)
+
+        if self.sensorsInUse[Sensor.SIGNAL0]:
+            fields["signal0Sum"] = discSum(self.signals[0], p.signalSensorRadius)
+            fields["signalLocs"] = discCount(p.sizeX, p.sizeY, p.signalSensorRadius)
+
+        if self.sensorsInUse[Sensor.POPULATION_FWD] or self.sensorsInUse[Sensor.POPULATION_LR]:
+            fields["populationAxis"] = directionalSum(occupied, p.populationSensorRadius)
+
+        if self.sensorsInUse[Sensor.SIGNAL0_FWD] or self.sensorsInUse[Sensor.SIGNAL0_LR]:
+            fields["signal0Axis"] = directionalSum(self.signals[0], p.signalSensorRadius)
+
+        if self.sensorsInUse[Sensor.LONGPROBE_POP_FWD]:
+            # A population probe stops at the first agent, or finds nothing
+            # if a barrier is in the way. The barrier probes use the
+            # generation-long Grid.barrierSteps instead.
+            steps = probeSteps(occupied, self.grid.barrierMask())
+            steps[Compass.CENTER] = 1  # probing in place finds oneself
+            fields["occupantSteps"] = steps
+
+        self.fields = fields
+
+    # Returns the sensor values of the individuals in rows lo..hi-1, an array
+    # of shape (hi - lo, NUM_SENSES). Sensors that no neural net reads are
+    # left at 0.0.
+    def computeAllSensors(self, simStep, rng, lo=0, hi=None):
+        hi = self.peeps.individuals if hi is None else hi
+        self.rng = rng
+        sensorValues = np.zeros((hi - lo, NUM_SENSES), dtype=np.float32)
+        for sensorNum in np.flatnonzero(self.sensorsInUse):
+            sensorValues[:, sensorNum] = _SENSOR_FUNCTIONS[Sensor(sensorNum)](self, simStep, lo, hi)
+
+        bad = ~((sensorValues >= -0.01) & (sensorValues <= 1.01))
+        if bad.any():
+            for sensorNum in np.flatnonzero(bad.any(axis=0)):
+                print("sensorVal out of range for {}".format(Sensor(sensorNum).name))
+            np.clip(np.nan_to_num(sensorValues), 0.0, 1.0, out=sensorValues)
+
+        return sensorValues
@@ -0,0 +1,150 @@
+# grid.py
+#
+# The grid is the 2D arena where the agents live.
+#
+# Grid is a somewhat dumb 2D container of unsigned 16-bit values.
+# Grid understands that the elements are either EMPTY, BARRIER, or
+# otherwise an index value into the peeps container.
+# The elements are allocated and cleared to EMPTY in init().
+#
+# The cells live in one contiguous uint16 NumPy array, data[x, y], with x as
+# the column and y as the row. All the query functions accept scalar
+# coordinates or same-shaped arrays of coordinates, so a whole population
+# can be tested in one call.
+
+import numpy as np
+
+from src.basicTypes import DIRS8, NORMALIZED_X, NORMALIZED_Y
+
+EMPTY = 0  # Index value 0 is reserved
+BARRIER = 0xffff
+
+NO_HIT = 0xffff  # see probeSteps()
+
+
+class Grid:
+    """ 2D arena of agent indexes and barriers"""
+
+    def __init__(self):
+        self.data = np.zeros((0, 0), dtype=np.uint16)
+        self.barrierLocations = np.zeros((0, 2), dtype=np.int16)
+        self.barrierCenters = np.zeros((0, 2), dtype=np.int16)
+        # Steps to the nearest barrier in each direction, see createBarrier()
+        self.barrierSteps = np.zeros((9, 0, 0), dtype=np.uint16)
+
+    # Allocates space for the 2D grid
+    def init(self, sizeX, sizeY):
+        self.data = np.zeros((sizeX, sizeY), dtype=np.uint16)
+        self.barrierSteps = np.full((9, sizeX, sizeY), NO_HIT, dtype=np.uint16)
+
+    def zeroFill(self):
+        self.data.fill(EMPTY)
+
+    def sizeX(self):
+        return self.data.shape[0]
+
+    def sizeY(self):
+        return self.data.shape[1]
+
+    def isInBounds(self, x, y):
+        return (x >= 0) & (x < self.sizeX()) & (y >= 0) & (y < self.sizeY())
+
+    def isEmptyAt(self, x, y):
+        return self.data[x, y] == EMPTY
+
+    def isBarrierAt(self, x, y):
+        return self.data[x, y] == BARRIER
+
+    # Occupied means an agent is living there.
+    def isOccupiedAt(self, x, y):
+        val = self.data[x, y]
+        return (val != EMPTY) & (val != BARRIER)
+
+    def isBorder(self, x, y):
+        return (x == 0) | (x == self.sizeX() - 1) | (y == 0) | (y == self.sizeY() - 1)
+
+    def at(self, x, y):
+        return self.data[x, y]
+
+    def set(self, x, y, val):
+        self.data[x, y] = val
+
+    # Masks of the whole grid, handy for the sensor and survival stages
+    def occupiedMask(self):
+        return (self.data != EMPTY) & (self.data != BARRIER)
+
+    def barrierMask(self):
+        return self.data == BARRIER
+
+    def getBarrierLocations(self):
+        return self.barrierLocations
+
+    def getBarrierCenters(self):
+        return self.barrierCenters
+
+    # Finds a random unoccupied location in the grid
+    def findEmptyLocation(self, rng):
+        x, y = self.findEmptyLocations(1, rng)
+        return int(x[0]), int(y[0])
+
+    # Finds n distinct random unoccupied locations in the grid. Instead of
+    # retrying random cells until an empty one turns up (which degrades badly
+    # as the population approaches the grid area), we draw directly from the
+    # flat set of free cells. Returns a pair of int16 arrays (x, y).
+    def findEmptyLocations(self, n, rng):
+        free = np.flatnonzero(self.data.ravel() == EMPTY)
+        if n > free.size:
+            raise ValueError("Grid has {} empty locations, {} requested".format(free.size, n))
+
+        picks = rng.choice(free, size=n, replace=False)
+        x, y = np.divmod(picks, self.sizeY())
+        return x.astype(np.int16), y.astype(np.int16)
+
+
+# This is a utility function used when inspecting a local neighborhood around
+# some location. This function feeds each valid (in-bounds) location in the specified
+# neighborhood to the specified function. Locations include self (center of the neighborhood).
+def visitNeighborhood(loc, radius, f, sizeX, sizeY):
+    x0, y0 = loc
+    r = int(radius)
+    for dx in range(-min(r, x0), min(r, (sizeX - x0) - 1) + 1):
+        x = x0 + dx
+        extentY = int(np.sqrt(radius * radius - dx * dx))
+        for dy in range(-min(extentY, y0), min(extentY, (sizeY - y0) - 1) + 1):
+            f((x, y0 + dy))
+
+
+# Returns, for every cell and each Compass direction, the number of steps to
+# the first hit cell when stepping from the cell in that direction, an array
+# of shape (9, sizeX, sizeY) of uint16. The value is NO_HIT if the walk leaves
+# the grid or reaches a stop cell first; the CENTER direction is all NO_HIT.
+# hit and stop are boolean masks of the grid.
+#
+# Each direction is one sweep over the grid, a column at a time starting
+# from the side the direction points to: a cell is one step from the next
+# cell if that is a hit, else one step further than the next cell is.
+def probeSteps(hit, stop):
+    steps = np.full((9,) + hit.shape, NO_HIT, dtype=np.uint16)
+    for dir in DIRS8:
+        dx, dy = int(NORMALIZED_X[dir]), int(NORMALIZED_Y[dir])
+        if dx != 0:
+            steps[dir] = _sweep(hit, stop, dx, dy)
+        else:
+            steps[dir] = _sweep(hit.T, stop.T, dy, dx).T
+    return steps
+
+
+# One sweep of probeSteps() in a direction with dx = +-1
+def _sweep(hit, stop, dx, dy):
+    sizeX, sizeY = hit.shape
+    steps = np.full((sizeX, sizeY), NO_HIT, dtype=np.uint32)
+    # Cell y of a column continues at cell y + dy of the next column
+    dst = slice(max(0, -dy), sizeY - max(0, dy))
+    src = slice(max(0, dy), sizeY - max(0, -dy))
+    xs = range(sizeX - 2, -1, -1) if dx > 0 else range(1, sizeX)
+    for x in xs:
+        nextSteps = np.minimum(steps[x + dx, src] + 1, NO_HIT)
+        nextSteps[stop[x + dx, src]] = NO_HIT
+        nextSteps[hit[x + dx, src]] = 1
+        steps[x, dst] = nextSteps
+    return steps.astype(np.uint16)
@@ -0,0 +1,433 @@
+# imageWriter.py
+#
+# Creates a graphic frame for each simStep of the video generations.
+#
+# imageWriter.cpp renders the frames on the main thread, or hands one frame
+# at a time to a single writer thread and drops the frame when that thread
+# is busy. Here the main loop only takes a snapshot of what a frame shows
+# (the locations and colors of the living, see saveVideoFrame()) and puts it
+# in a bounded ring buffer. Dispatcher threads feed the snapshots to a pool
+# of worker processes, which rasterize the frames. p.videoEncoder says what
+# becomes of them:
+#
+#     ffmpeg   the frames are streamed in order through a pipe into an
+#              ffmpeg process encoding the video gen-<generation>.avi
+#     raw      the frames are streamed in order into gen-<generation>.rgb,
+#              raw rgb24 frames of the size in the name of the file
+#     png      the workers encode the frames as PNG files
+#              frame-<generation>-<simStep>.png
+#
+# Unlike imageWriter.cpp, which collects the images of the whole generation
+# before saving the video, a frame is gone as soon as it is written, so only
+# a few frames are in memory at any time. If ffmpeg is not installed, png is
+# used instead.
+#
+# When the ring buffer is full, p.videoBackpressure decides what happens:
+#
+#     block         the main loop waits for a free slot, no frame is lost
+#     drop-oldest   the oldest waiting frame is dropped for the new one
+#     drop-newest   the new frame is dropped, as imageWriter.cpp does
+#
+# The dropped frames are counted and reported at the end of the generation.
+
+import collections
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import zlib
+
+import numpy as np
+
+from src.genome import sourceType, sourceNum, sinkType, sinkNum
+
+# True if the frames of the generation go in a video
+def isVideoGeneration(generation, p):
+    return (p.saveVideo and
+            ((generation % p.videoStride) == 0
+             or generation <= p.videoSaveFirstFrames
+             or (generation >= p.replaceBarrierTypeGenerationNumber
+                 and generation <= p.replaceBarrierTypeGenerationNumber + p.videoSaveFirstFrames)))
+
+
+# Returns the 8-bit colors of the genomes packed in genes with the specified
+# offsets and lengths, made from a few bits of the first and last genes, so
+# that related individuals look alike
+def makeGeneticColor(genes, offsets, lengths):
+    lengths = np.asarray(lengths, dtype=np.int64)
+    front = genes[np.asarray(offsets, dtype=np.int64)]
+    back = genes[np.asarray(offsets, dtype=np.int64) + lengths - 1]
+    return ((lengths & 1)
+            | (sourceType(front) << 1)
+            | (sourceType(back) << 2)
+            | (sinkType(front) << 3)
+            | (sinkType(back) << 4)
+            | ((sourceNum(front) & 1) << 5)
+            | ((sinkNum(front) & 1) << 6)
+            | ((sourceNum(back) & 1) << 7)).astype(np.uint8)
+
+
+# Returns the (256, 3) RGB palette of the 8-bit genetic colors
+def _makeColorTable():
+    maxColorVal = 0xb0
+    maxLumaVal = 0xb0
+
+    c = np.arange(256, dtype=np.int32)
+    rgb = np.stack([c, ((c & 0x1f) << 3), ((c & 7) << 5)], axis=1)
+
+    # Prevent color mappings to very bright colors (hard to see):
+    luma = (3 * rgb[:, 0] + rgb[:, 2] + 4 * rgb[:, 1]) // 8
+    tooBright = (luma > maxLumaVal)[:, None] & (rgb > maxColorVal)
+    return np.where(tooBright, rgb % maxColorVal, rgb).astype(np.uint8)
+
+
+# Returns RGB colors as packed RGBX pixels, one uint32 each, so that a pixel
+# is written with a single element assignment
+def _packPixels(rgb):
+    rgbx = np.zeros((len(rgb), 4), dtype=np.uint8)
+    rgbx[:, :3] = rgb
+    return rgbx.view(np.uint32).ravel()
+
+
+COLOR_TABLE = _makeColorTable()
+_COLOR_PIXELS = _packPixels(COLOR_TABLE)
+
+# Colors of the cells of the grid, before the agents are drawn
+_EMPTY_COLOR = 0
+_BARRIER_COLOR = 1
+_CELL_PIXELS = _packPixels(np.array([[255, 255, 255], [0x88, 0x88, 0x88]], dtype=np.uint8))
+
+
+# Returns the pixel offsets (dy, dx) of a filled disc of the specified radius
+def discStamp(radius):
+    r = int(radius)
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = np.abs(dx) <= np.floor(np.sqrt(np.maximum(radius * radius - dy * dy, 0.0)))
+    return dy[inside], dx[inside]
+
+
+class ImageFrameData:
+    """ Data needed to construct one image frame"""
+
+    # The arrays are copies, so the main loop can go on with the simStep
+    # while a worker draws the frame
+    def __init__(self, simStep, generation, locX, locY, colors, barrierLocs):
+        self.simStep = simStep
+        self.generation = generation
+        self.locX = locX
+        self.locY = locY
+        self.colors = colors
+        self.barrierLocs = barrierLocs
+
+
+# Returns the RGB image of a frame, an array of shape
+# (sizeY * displayScale, sizeX * displayScale, 3) with y = 0 at the bottom.
+# The image is built from the cell colors of the grid scaled up to pixels,
+# then every agent's disc is stamped in one indexing operation. The pixels
+# are drawn as packed RGBX on a canvas with a margin wide enough for the
+# discs, so no pixel needs clipping.
+def renderFrame(p, data):
+    scale = p.displayScale
+    height, width = p.sizeY * scale, p.sizeX * scale
+    dy, dx = discStamp(p.agentSize)
+    margin = int(p.agentSize)
+    canvas = np.empty((height + 2 * margin, width + 2 * margin), dtype=np.uint32)
+    image = canvas[margin:margin + height, margin:margin + width]
+
+    # Cell colors, upside down so that row 0 of the image is the top of the
+    # grid, looked up and scaled up by scale in both directions
+    cells = np.full((p.sizeY, p.sizeX), _EMPTY_COLOR, dtype=np.uint8)
+    if len(data.barrierLocs) > 0:
+        cells[p.sizeY - 1 - data.barrierLocs[:, 1], data.barrierLocs[:, 0]] = _BARRIER_COLOR
+    image[...] = np.repeat(np.repeat(_CELL_PIXELS[cells], scale, axis=0), scale, axis=1)
+
+    # A barrier rectangle starts scale / 2 pixels before its cell and ends
+    # one pixel after it, as in imageWriter.cpp
+    if len(data.barrierLocs) > 0:
+        barrier = np.repeat(np.repeat(cells == _BARRIER_COLOR, scale, axis=0), scale, axis=1)
+        half = scale // 2
+        if half > 0:
+            barrier[:-half] |= barrier[half:]
+            barrier[:, :-half] |= barrier[:, half:]
+        barrier[1:] |= barrier[:-1].copy()
+        barrier[:, 1:] |= barrier[:, :-1].copy()
+        image[barrier] = _CELL_PIXELS[_BARRIER_COLOR]
+
+    # Draw agents, centered on the lower left corner of their cell
+    rows = (p.sizeY - 1 - data.locY.astype(np.int64)) * scale + margin
+    cols = data.locX.astype(np.int64) * scale + margin
+    pixels = (rows[:, None] + dy) * canvas.shape[1] + cols[:, None] + dx
+    canvas.reshape(-1)[pixels.ravel()] = np.repeat(_COLOR_PIXELS[data.colors], len(dy))
+
+    return image.view(np.uint8).reshape(height, width, 4)[:, :, :3]
+
+
+# Returns the PNG file contents of an RGB image of shape (height, width, 3)
+def encodePng(image, level=1):
+    height, width, _ = image.shape
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+    # Every row of pixels starts with filter type 0 (None)
+    rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * 3)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), level))
+            + chunk(b"IEND", b""))
+
+
+# Saves the image of a frame as frame-<generation>-<simStep>.png
+def _writePng(p, data, image):
+    imageFilename = os.path.join(p.imageDir, "frame-{:06d}-{:06d}.png".format(data.generation, data.simStep))
+    with open(imageFilename, "wb") as f:
+        f.write(encodePng(image))
+
+
+class FfmpegStream:
+    """ Video of one generation encoded by an ffmpeg process"""
+
+    def __init__(self, filename, width, height, framesPerSecond=25):
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-y",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "{}x{}".format(width, height),
+             "-r", str(framesPerSecond), "-i", "-",
+             "-c:v", "libx264", "-pix_fmt", "yuv420p", filename],
+            stdin=subprocess.PIPE)
+
+    def write(self, image):
+        self.process.stdin.write(image.tobytes())
+
+    # Ends the input; ffmpeg finishes the file on its own, see finished()
+    # and wait(). The pipe may already be broken if ffmpeg has exited.
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    # True once the ffmpeg process has exited; reaps it
+    def finished(self):
+        return self.process.poll() is not None
+
+    def wait(self):
+        self.process.wait()
+
+
+class RawStream:
+    """ Video of one generation as raw rgb24 frames"""
+
+    def __init__(self, filename, width, height):
+        self.file = open(filename, "wb")
+
+    def write(self, image):
+        self.file.write(image.tobytes())
+
+    def close(self):
+        self.file.close()
+
+    def finished(self):
+        return True
+
+    def wait(self):
+        pass
+
+
+class ImageWriter:
+    """ Renders and saves the video frames in worker processes"""
+
+    def __init__(self, p):
+        self.p = p
+        self.frames = collections.deque()  # the ring buffer of waiting snapshots
+        self.condition = threading.Condition()
+        self.inFlight = 0
+        self.droppedFrameCount = 0  # over the whole run
+        self.skippedFrames = 0      # in the current generation
+        self.pool = None
+        self.threads = []
+        self.abortRequested = False
+        self.encoder = p.videoEncoder
+        self.stream = None
+        self.closedStreams = []  # still finishing their files
+        # Rendered frames waiting for their turn to be written to the stream
+        self.writeLock = threading.Lock()
+        self.rendered = {}
+        self.startNewGeneration()
+
+    # Starts the worker processes and the threads feeding them
+    def start(self):
+        numWorkers = self.p.videoWorkers
+        os.makedirs(self.p.imageDir, exist_ok=True)
+        if self.encoder == "ffmpeg" and shutil.which("ffmpeg") is None:
+            print("ffmpeg not found, saving the video frames as PNG files")
+            self.encoder = "png"
+        self.pool = multiprocessing.Pool(numWorkers, initializer=_initWorker, initargs=(self.p,))
+        self.threads = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(numWorkers)]
+        for thread in self.threads:
+            thread.start()
+
+    def startNewGeneration(self):
+        self.colors = None
+        self.skippedFrames = 0
+        # Sequence numbers of the frames handed to the workers and written
+        self.numDispatched = 0
+        self.numWritten = 0
+
+    # Opens the video stream of the generation, unless the frames are saved
+    # as PNG files
+    def _openStream(self, generation):
+        width, height = self.p.sizeX * self.p.displayScale, self.p.sizeY * self.p.displayScale
+        if self.encoder == "ffmpeg":
+            filename = os.path.join(self.p.imageDir, "gen-{:06d}.avi".format(generation))
+            return FfmpegStream(filename, width, height)
+        if self.encoder == "raw":
+            filename = os.path.join(self.p.imageDir, "gen-{:06d}-{}x{}.rgb".format(generation, width, height))
+            return RawStream(filename, width, height)
+        return None
+
+    # Queues a snapshot of the living individuals for rendering. The colors
+    # are made once per generation, the genomes don't change in between.
+    # Returns False if the frame was dropped.
+    def saveVideoFrame(self, simStep, generation, peeps, grid):
+        if self.pool is None:
+            self.start()
+        if self.colors is None:
+            self.colors = np.zeros(peeps.individuals, dtype=np.uint8)
+            self.colors[1:] = makeGeneticColor(peeps.genes, peeps.genomeOffset[1:], peeps.genomeLength[1:])
+            self.barrierLocs = np.array(grid.getBarrierLocations(), dtype=np.int64).reshape(-1, 2)
+            self.stream = self._openStream(generation)
+
+        living = peeps.livingIndexes()
+        data = ImageFrameData(simStep, generation, peeps.locX[living], peeps.locY[living],
+                              self.colors[living], self.barrierLocs)
+
+        with self.condition:
+            if len(self.frames) >= self.p.videoQueueSize:
+                if self.p.videoBackpressure == "drop-newest":
+                    self._dropFrames(1)
+                    return False
+                if self.p.videoBackpressure == "drop-oldest":
+                    self.frames.popleft()
+                    self._dropFrames(1)
+                else:
+                    self.condition.wait_for(lambda: len(self.frames) < self.p.videoQueueSize)
+            self.frames.append(data)
+            self.condition.notify_all()
+        return True
+
+    def _dropFrames(self, n):
+        self.droppedFrameCount += n
+        self.skippedFrames += n
+
+    # Waits until all the frames of the generation are written, then closes
+    # the video. The encoder finishes the file while the simulation goes on.
+    def saveGenerationVideo(self, generation):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.frames and self.inFlight == 0)
+        self._closeStream()
+        # Forget the encoders that have finished their files
+        self.closedStreams = [stream for stream in self.closedStreams if not stream.finished()]
+        if self.skippedFrames > 0:
+            print("Video skipped {} frames".format(self.skippedFrames))
+        self.startNewGeneration()
+
+    def _closeStream(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.closedStreams.append(self.stream)
+            self.stream = None
+
+    # Writes the rendered frames that are next in sequence to the stream.
+    # The workers may finish the frames in any order; image is None if
+    # rendering the frame failed. If the stream can't be written to (ffmpeg
+    # exited, disk full), it is given up and the rest of the generation is
+    # saved as PNG files.
+    def _writeInOrder(self, sequenceNumber, data, image):
+        with self.writeLock:
+            self.rendered[sequenceNumber] = (data, image)
+            while self.numWritten in self.rendered:
+                data, image = self.rendered.pop(self.numWritten)
+                self.numWritten += 1
+                if image is None:
+                    continue
+                if self.stream is not None:
+                    try:
+                        self.stream.write(image)
+                        continue
+                    except OSError as e:
+                        print("imageWriter: video of generation {} not saved: {}".format(data.generation, e))
+                        self._closeStream()
+                try:
+                    _writePng(self.p, data, image)
+                except OSError as e:
+                    print("imageWriter: frame {} of generation {} not saved: {}".format(data.simStep, data.generation, e))
+
+    # Runs in a thread; hands the waiting frames to the worker processes one
+    # at a time, until abort()
+    def _dispatch(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.frames or self.abortRequested)
+                if self.abortRequested and not self.frames:
+                    return
+                data = self.frames.popleft()
+                sequenceNumber = self.numDispatched
+                self.numDispatched += 1
+                self.inFlight += 1
+                streaming = self.stream is not None
+                self.condition.notify_all()
+            try:
+                image = None
+                try:
+                    if streaming:
+                        image = self.pool.apply(_renderFrame, (data,))
+                    else:
+                        self.pool.apply(_saveFrame, (data,))
+                except Exception as e:
+                    print("imageWriter: frame {} of generation {} not saved: {}".format(data.simStep, data.generation, e))
+                if streaming:
+                    self._writeInOrder(sequenceNumber, data, image)
+            finally:
+                with self.condition:
+                    self.inFlight -= 1
+                    self.condition.notify_all()
+
+    # Saves the frames still waiting, then stops the threads and the workers
+    def abort(self):
+        with self.condition:
+            self.abortRequested = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        self._closeStream()
+        for stream in self.closedStreams:
+            stream.wait()
+        self.closedStreams = []
+        self.threads = []
+        self.abortRequested = False
+
+
+# ---------------------------- Worker process side ----------------------------
+
+_p = None
+
+
+def _initWorker(p):
+    global _p
+    _p = p
+
+
+def _renderFrame(data):
+    return np.ascontiguousarray(renderFrame(_p, data))
+
+
+def _saveFrame(data):
+    _writePng(_p, data, renderFrame(_p, data))
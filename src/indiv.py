@@ -1,21 +1,59 @@
+# indiv.py
+#
+# Indiv is the structure that represents one individual agent.
+#
+# The agent's members are stored in the columns of the Peeps container
+# (see peeps.py); an Indiv is just a lightweight view of one row of those
+# columns, so reading or writing a member goes straight to the column.
+
+
+def _column(name):
+    def get(self):
+        return getattr(self.peeps, name)[self.index]
+
+    def set(self, value):
+        getattr(self.peeps, name)[self.index] = value
+
+    return property(get, set)
+
+
 class Indiv:
 
+    __slots__ = ("peeps", "index")
+
+    def __init__(self, peeps, index):
+        self.peeps = peeps
+        self.index = index  # index into peeps[] container
+
+    alive = _column("alive")
+    age = _column("age")
+    responsiveness = _column("responsiveness")  # 0.0..1.0 (0 is like asleep)
+    oscPeriod = _column("oscPeriod")  # 2..4*p.stepsPerGeneration (TBD, see executeActions())
+    longProbeDist = _column("longProbeDist")  # distance for long forward probe for obstructions
+    lastMoveDir = _column("lastMoveDir")  # direction of last movement
+    challengeBits = _column("challengeBits")  # modified when the indiv accomplishes some task
+    genomeOffset = _column("genomeOffset")
+    genomeLength = _column("genomeLength")
+
+    # refers to a location in grid[][]
+    @property
+    def loc(self):
+        return (int(self.peeps.locX[self.index]), int(self.peeps.locY[self.index]))
+
+    @loc.setter
+    def loc(self, loc):
+        self.peeps.locX[self.index], self.peeps.locY[self.index] = loc
+
+    # view of this individual's genes, see genome.py
+    @property
+    def genome(self):
+        return self.peeps.genome(self.index)
+
+    @property
+    def birthLoc(self):
+        return (int(self.peeps.birthLocX[self.index]), int(self.peeps.birthLocY[self.index]))
+
     # This is called when any individual is spawned.
-    # The responsiveness parameter will be initialized here to maximum value
-    # of 1.0, depending on which action activation function is used,
-    # the default undriven value may be changed to 1.0 or action midrange.
-
-    def initialize(self, index_, loc_, andgenome_):
-        index = index_
-        loc = loc_
-        #birthLoc = loc_
-        grid.set(loc_, index_)
-        age = 0
-        oscPeriod = 34; # ToDo not !not  define a constant
-        alive = True
-        lastMoveDir = Dir.random8()
-        responsiveness = 0.5; # range 0.0..1.0
-        #longProbeDist = p.longProbeDistance
-        #challengeBits = (unsigned)False; # will be set True when some task gets accomplished
-        #genome = std.move(genome_)
-        #createWiringFromGenome()
+    # See Peeps.initialize(), which spawns any number of individuals at once.
+    def initialize(self, loc_, grid, rng, longProbeDist):
+        self.peeps.initialize(self.index, loc_[0], loc_[1], grid, rng, longProbeDist)
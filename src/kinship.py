@@ -0,0 +1,133 @@
+# kinship.py
+#
+# Finds the kin of the sacrificed individuals of the altruism challenge among
+# the parents, see spawnNewGeneration(). A parent is kin of a sacrificed
+# individual if the similarity of their genomes (see genomeCompare.py) is at
+# least a threshold.
+#
+# spawnNewGeneration.cpp scans the parents from a random start for every
+# sacrificed individual, ten times over, comparing one pair of genomes at a
+# time. Here the kin of all the sacrificed are found once, as a list of
+# (sacrificed, parent) pairs, and each pass just picks the first kin after
+# its random start. The pairs come from either
+#
+#   KinIndex, a locality-sensitive hash index of the parent genomes for the
+#   bit-by-bit Hamming measure. Each of numTables tables keys a genome by
+#   bitsPerKey of its bits, sampled at random positions; genomes that differ
+#   in few bits share a key in some table with high probability, random
+#   genomes rarely do. Only the parents sharing a key with a sacrificed
+#   genome are compared with it. Kin may be missed, with a small
+#   probability.
+#
+#   kinPairsMatrix(), which compares every sacrificed genome with every
+#   parent genome in batches, for the other comparison methods and for few
+#   parents.
+
+import numpy as np
+
+from src.genome import GENE_DTYPE, genomeOffsets
+from src.genomeCompare import pairSimilarity, similarityMatrix
+
+# Below this many parents the similarity matrix is cheaper than an index
+MIN_INDEXED_PARENTS = 256
+
+
+# Returns the (sacrificed, parent) pairs of kin, comparing all the genomes
+def kinPairsMatrix(parentGenes, parentLengths, genes, lengths, method, threshold):
+    similarity = similarityMatrix(genes, lengths, parentGenes, parentLengths, method)
+    return np.nonzero(similarity >= threshold)
+
+
+class KinIndex:
+    """ Locality-sensitive hash index of parent genomes"""
+
+    def __init__(self, parentGenes, parentLengths, method, threshold, rng, numTables=32, bitsPerKey=12):
+        self.parentGenes = np.asarray(parentGenes, dtype=GENE_DTYPE)
+        self.parentLengths = np.asarray(parentLengths, dtype=np.int64)
+        self.parentOffsets = genomeOffsets(self.parentLengths)
+        self.method = method
+        self.threshold = threshold
+
+        # Bit positions sampled from the bits every parent genome has
+        minBits = 32 * int(self.parentLengths.min())
+        self.positions = rng.integers(0, minBits, size=(numTables, bitsPerKey))
+
+        # One sorted key column per table
+        keys = self._keys(self.parentGenes, self.parentOffsets, self.parentLengths)
+        self.order = np.argsort(keys, axis=1, kind="stable")
+        self.sortedKeys = np.take_along_axis(keys, self.order, axis=1)
+
+    # Returns the (numTables, numGenomes) keys of the genomes. Sampled bits
+    # past the end of a shorter genome read as 0.
+    def _keys(self, genes, offsets, lengths):
+        gene, bit = np.divmod(self.positions, 32)
+        inGenome = gene[:, :, None] < lengths
+        index = np.where(inGenome, offsets + gene[:, :, None], 0)
+        bits = np.where(inGenome, (genes[index] >> bit[:, :, None].astype(GENE_DTYPE)) & 1, 0)
+        weights = np.int64(1) << np.arange(self.positions.shape[1], dtype=np.int64)
+        return np.tensordot(weights, bits.astype(np.int64), axes=(0, 1))
+
+    # Returns the (sacrificed, parent) pairs of kin of the genomes packed in
+    # genes with the specified lengths
+    def kinPairs(self, genes, lengths):
+        genes = np.asarray(genes, dtype=GENE_DTYPE)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        numParents = len(self.parentLengths)
+        keys = self._keys(genes, genomeOffsets(lengths), lengths)
+
+        # The parents sharing a key with each genome, in any table
+        queries, parents = [], []
+        for table in range(len(keys)):
+            low = np.searchsorted(self.sortedKeys[table], keys[table], side="left")
+            high = np.searchsorted(self.sortedKeys[table], keys[table], side="right")
+            counts = high - low
+            query = np.repeat(np.arange(len(lengths)), counts)
+            slot = np.arange(len(query)) - np.repeat(genomeOffsets(counts), counts) + low[query]
+            queries.append(query)
+            parents.append(self.order[table][slot])
+        candidates = np.unique(np.concatenate(queries) * numParents + np.concatenate(parents))
+        query, parent = np.divmod(candidates, numParents)
+
+        # Keep the candidates that really are kin
+        allGenes = np.concatenate([self.parentGenes, genes])
+        allLengths = np.concatenate([self.parentLengths, lengths])
+        similarity = pairSimilarity(allGenes, genomeOffsets(allLengths), allLengths,
+                                    numParents + query, parent, self.method)
+        kin = similarity >= self.threshold
+        return query[kin], parent[kin]
+
+
+# Returns the (sacrificed, parent) pairs of kin of the genomes packed in genes
+# with the specified lengths, through a KinIndex where it applies
+def kinPairs(parentGenes, parentLengths, genes, lengths, method, threshold, rng):
+    if len(parentLengths) == 0 or len(lengths) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    if method == 1 and len(parentLengths) >= MIN_INDEXED_PARENTS:
+        return KinIndex(parentGenes, parentLengths, method, threshold, rng).kinPairs(genes, lengths)
+    return kinPairsMatrix(parentGenes, parentLengths, genes, lengths, method, threshold)
+
+
+# Picks one kin parent for each start: for start k, the first kin parent of
+# sacrificed[k] at or after parent position starts[k], wrapping around, as
+# the scan in spawnNewGeneration.cpp does. query and parent are the kin
+# pairs. Returns the parent positions, -1 where the sacrificed has no kin.
+def firstKin(query, parent, numParents, sacrificed, starts):
+    first = np.full(len(sacrificed), -1, dtype=np.int64)
+    if len(query) == 0:
+        return first
+
+    # Kin pairs grouped by sacrificed individual
+    order = np.argsort(query, kind="stable")
+    query, parent = query[order], parent[order]
+    low = np.searchsorted(query, sacrificed, side="left")
+    counts = np.searchsorted(query, sacrificed, side="right") - low
+
+    # Each start against each kin of its sacrificed individual
+    start = np.repeat(np.arange(len(sacrificed)), counts)
+    slot = np.arange(len(start)) - np.repeat(genomeOffsets(counts), counts) + low[start]
+    distance = (parent[slot] - starts[start]) % numParents
+    best = np.lexsort((distance, start))
+    isFirst = np.ones(len(best), dtype=np.bool_)
+    isFirst[1:] = start[best[1:]] != start[best[:-1]]
+    first[start[best[isFirst]]] = parent[slot[best[isFirst]]]
+    return first
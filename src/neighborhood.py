@@ -0,0 +1,104 @@
+# neighborhood.py
+#
+# Whole-grid versions of visitNeighborhood().
+#
+# visitNeighborhood() feeds every in-bounds cell of a disc of some radius to a
+# callback, one cell at a time. The sensors and survival criteria only ever use
+# it to add something up over the disc, so here the same sums are computed for
+# every cell of the grid at once and then sampled at the agents' locations.
+#
+# A disc of radius r is the set of columns dx = -int(r)..int(r), each column
+# spanning dy = -extentY..extentY with extentY = int(sqrt(r*r - dx*dx)), exactly
+# as visitNeighborhood() walks it. Summing a layer over the disc is done with
+# a summed-area table along y: each disc column is the difference of two
+# prefix sums, so a disc sum costs 2*int(r)+1 array operations over the grid,
+# independent of the area of the disc.
+#
+# The axis sensors weigh each cell of the disc by its distance and direction
+# instead, so their sums are computed as a correlation with one precomputed
+# kernel per direction.
+
+import numpy as np
+
+from src.basicTypes import Compass, raySameness
+
+
+# Returns the (dx, extentY) pairs describing the columns of a disc
+def discColumns(radius):
+    r = int(radius)
+    return [(dx, int(np.sqrt(radius * radius - dx * dx))) for dx in range(-r, r + 1)]
+
+
+# Returns the sum of layer over the disc of the specified radius centered on
+# every cell, counting only in-bounds cells. The result has the shape of
+# layer and a wide enough dtype to hold the sums.
+def discSum(layer, radius):
+    sizeX, sizeY = layer.shape
+    values = layer.astype(np.int32 if layer.dtype.kind in "biu" else np.float64)
+
+    # prefix[x, y] is the sum of layer[x, 0..y-1]
+    prefix = np.zeros((sizeX, sizeY + 1), dtype=values.dtype)
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+
+    total = np.zeros_like(values)
+    y = np.arange(sizeY)
+    for dx, extentY in discColumns(radius):
+        xLo, xHi = max(0, -dx), min(sizeX, sizeX - dx)
+        if xLo >= xHi:
+            continue
+        yLo = np.clip(y - extentY, 0, sizeY)
+        yHi = np.clip(y + extentY + 1, 0, sizeY)
+        column = prefix[xLo + dx:xHi + dx]
+        total[xLo:xHi] += column[:, yHi] - column[:, yLo]
+
+    return total
+
+
+_discCounts = {}
+
+
+# Returns the number of in-bounds cells in the disc centered on every cell.
+# This depends only on the grid size and radius, so it is cached.
+def discCount(sizeX, sizeY, radius):
+    key = (sizeX, sizeY, radius)
+    if key not in _discCounts:
+        _discCounts[key] = discSum(np.ones((sizeX, sizeY), dtype=np.int32), radius)
+    return _discCounts[key]
+
+
+_directionalKernels = {}
+
+
+# Returns the weights getPopulationDensityAlongAxis() and
+# getSignalDensityAlongAxis() give to the cells of a disc, one kernel per
+# Compass direction: kernels[dir, R + dx, R + dy] is (1/dist) * cos of the
+# angle between the offset (dx, dy) and dir, with R = int(radius). The center
+# and the cells outside the disc weigh 0.0. The kernels depend only on the
+# radius, so they are cached.
+def directionalKernels(radius):
+    if radius not in _directionalKernels:
+        r = int(radius)
+        kernels = np.zeros((9, 2 * r + 1, 2 * r + 1), dtype=np.float64)
+        for dx, extentY in discColumns(radius):
+            for dy in range(-extentY, extentY + 1):
+                if dx == 0 and dy == 0:
+                    continue
+                dist = np.sqrt(dx * dx + dy * dy)
+                for dir in Compass:
+                    kernels[dir, r + dx, r + dy] = (1.0 / dist) * raySameness(dx, dy, dir)
+        kernels.flags.writeable = False
+        _directionalKernels[radius] = kernels
+    return _directionalKernels[radius]
+
+
+# Returns the directional kernels of the specified radius applied to layer
+# around every cell, an array of shape (9, sizeX, sizeY) indexed by Compass
+# direction then location. The layer is zero-padded so out-of-bounds cells
+# add nothing, as in visitNeighborhood(); the shifted copies of the layer are
+# contracted against all the kernels in one tensordot.
+def directionalSum(layer, radius):
+    kernels = directionalKernels(radius)
+    r = kernels.shape[1] // 2
+    padded = np.pad(layer.astype(np.float64), r)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, kernels.shape[1:])
+    return np.moveaxis(np.tensordot(windows, kernels, axes=([2, 3], [1, 2])), 2, 0)
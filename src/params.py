@@ -0,0 +1,218 @@
+# params.py
+#
+# Global simulator parameters. See params.cpp and params.h for notes.
+#
+# To add a parameter:
+#    1. Add a member and its default value to Params.setDefaults().
+#    2. Add an entry to Params.ingestParameter().
+#    3. Add a line to the user's parameter file (default name biosim4.ini)
+
+import sys
+
+
+def checkIfUint(s):
+    return s.isdigit()
+
+
+def checkIfInt(s):
+    try:
+        int(s)
+    except ValueError:
+        return False
+    return True
+
+
+def checkIfFloat(s):
+    try:
+        float(s)
+    except ValueError:
+        return False
+    return True
+
+
+def checkIfBool(s):
+    return s.lower() in ("0", "1", "true", "false")
+
+
+def getBoolVal(s):
+    return s.lower() in ("1", "true")
+
+
+class Params:
+    """ Simulator parameters, defaults overridden by the config file"""
+
+    def __init__(self):
+        self.configFilename = None
+        self.setDefaults()
+
+    def setDefaults(self):
+        self.sizeX = 128
+        self.sizeY = 128
+        self.challenge = 0
+
+        self.genomeInitialLengthMin = 16
+        self.genomeInitialLengthMax = 16
+        self.genomeMaxLength = 20
+        self.logDir = "./logs/"
+        self.imageDir = "./images/"
+        self.population = 100
+        self.stepsPerGeneration = 100
+        self.maxGenerations = 100
+        self.barrierType = 0
+        self.replaceBarrierType = 0
+        self.replaceBarrierTypeGenerationNumber = 0xffffffff
+        self.numThreads = 1
+        self.deterministic = False
+        self.RNGSeed = 12345678
+        self.signalLayers = 1
+        self.maxNumberNeurons = self.genomeMaxLength // 2
+        self.pointMutationRate = 0.0001
+        self.geneInsertionDeletionRate = 0.0001
+        self.deletionRatio = 0.7
+        self.killEnable = False
+        self.sexualReproduction = True
+        self.chooseParentsByFitness = True
+        self.populationSensorRadius = 2.0
+        self.signalSensorRadius = 1.0
+        self.responsiveness = 0.5
+        self.responsivenessCurveKFactor = 2
+        self.longProbeDistance = 16
+        self.shortProbeBarrierDistance = 3
+        self.valenceSaturationMag = 0.5
+        self.saveVideo = True
+        self.videoStride = 1
+        self.videoSaveFirstFrames = 0
+        self.videoWorkers = 2
+        self.videoQueueSize = 16
+        self.videoBackpressure = "block"
+        self.videoEncoder = "ffmpeg"
+        self.saveTrajectories = False
+        self.trajectoryStride = 1
+        self.displayScale = 1
+        self.agentSize = 2
+        self.genomeAnalysisStride = 1
+        self.displaySampleGenomes = 0
+        self.genomeComparisonMethod = 1
+        self.analysisSampleSize = 1000
+        self.updateGraphLog = False
+        self.updateGraphLogStride = 16
+        self.epochLogFormat = "txt"
+        self.epochLogFlushInterval = 16
+        self.graphLogUpdateCommand = "/usr/bin/gnuplot --persist ./tools/graphlog.gp"
+
+    def registerConfigFile(self, filename):
+        self.configFilename = filename
+
+    # Each entry is: lowercase name -> (member name, kind, validity check).
+    # kind is one of "uint", "int", "float", "bool" or "str".
+    _ingestTable = {
+        "sizex": ("sizeX", "uint", lambda v: 2 <= v <= 0xffff),
+        "sizey": ("sizeY", "uint", lambda v: 2 <= v <= 0xffff),
+        "challenge": ("challenge", "uint", lambda v: v < 0xffff),
+        "genomeinitiallengthmin": ("genomeInitialLengthMin", "uint", lambda v: 0 < v < 0xffff),
+        "genomeinitiallengthmax": ("genomeInitialLengthMax", "uint", lambda v: 0 < v < 0xffff),
+        "logdir": ("logDir", "str", None),
+        "imagedir": ("imageDir", "str", None),
+        "population": ("population", "uint", lambda v: 0 < v < 0xffffffff),
+        "stepspergeneration": ("stepsPerGeneration", "uint", lambda v: 0 < v < 0xffff),
+        "maxgenerations": ("maxGenerations", "uint", lambda v: 0 < v < 0x7fffffff),
+        "barriertype": ("barrierType", "uint", lambda v: v < 0xffffffff),
+        "replacebarriertype": ("replaceBarrierType", "uint", lambda v: v < 0xffffffff),
+        "numthreads": ("numThreads", "uint", lambda v: 0 < v < 0xffff),
+        "deterministic": ("deterministic", "bool", None),
+        "rngseed": ("RNGSeed", "uint", None),
+        "signallayers": ("signalLayers", "uint", lambda v: v < 0xffff),
+        "genomemaxlength": ("genomeMaxLength", "uint", lambda v: 0 < v < 0xffff),
+        "maxnumberneurons": ("maxNumberNeurons", "uint", lambda v: 0 < v < 0xffff),
+        "pointmutationrate": ("pointMutationRate", "float", lambda v: 0.0 <= v <= 1.0),
+        "geneinsertiondeletionrate": ("geneInsertionDeletionRate", "float", lambda v: 0.0 <= v <= 1.0),
+        "deletionratio": ("deletionRatio", "float", lambda v: 0.0 <= v <= 1.0),
+        "killenable": ("killEnable", "bool", None),
+        "sexualreproduction": ("sexualReproduction", "bool", None),
+        "chooseparentsbyfitness": ("chooseParentsByFitness", "bool", None),
+        "populationsensorradius": ("populationSensorRadius", "float", lambda v: v > 0.0),
+        "signalsensorradius": ("signalSensorRadius", "float", lambda v: v > 0.0),
+        "responsiveness": ("responsiveness", "float", lambda v: v >= 0.0),
+        "responsivenesscurvekfactor": ("responsivenessCurveKFactor", "uint", lambda v: 1 <= v <= 20),
+        "longprobedistance": ("longProbeDistance", "uint", lambda v: v > 0),
+        "shortprobebarrierdistance": ("shortProbeBarrierDistance", "uint", lambda v: v > 0),
+        "valencesaturationmag": ("valenceSaturationMag", "float", lambda v: v >= 0.0),
+        "savevideo": ("saveVideo", "bool", None),
+        "videostride": ("videoStride", "uint", lambda v: v > 0),
+        "videosavefirstframes": ("videoSaveFirstFrames", "uint", None),
+        "videoworkers": ("videoWorkers", "uint", lambda v: v > 0),
+        "videoqueuesize": ("videoQueueSize", "uint", lambda v: v > 0),
+        "videobackpressure": ("videoBackpressure", "str", lambda v: v in ("block", "drop-oldest", "drop-newest")),
+        "videoencoder": ("videoEncoder", "str", lambda v: v in ("ffmpeg", "raw", "png")),
+        "savetrajectories": ("saveTrajectories", "bool", None),
+        "trajectorystride": ("trajectoryStride", "uint", lambda v: v > 0),
+        "displayscale": ("displayScale", "uint", lambda v: v > 0),
+        "agentsize": ("agentSize", "float", lambda v: v > 0.0),
+        "genomeanalysisstride": ("genomeAnalysisStride", "uint", lambda v: v > 0),
+        "displaysamplegenomes": ("displaySampleGenomes", "uint", None),
+        "genomecomparisonmethod": ("genomeComparisonMethod", "uint", lambda v: v <= 2),
+        "analysissamplesize": ("analysisSampleSize", "uint", None),
+        "updategraphlog": ("updateGraphLog", "bool", None),
+        "updategraphlogstride": ("updateGraphLogStride", "uint", lambda v: v > 0),
+        "epochlogformat": ("epochLogFormat", "str", lambda v: v in ("txt", "csv", "bin")),
+        "epochlogflushinterval": ("epochLogFlushInterval", "uint", lambda v: v > 0),
+    }
+
+    def ingestParameter(self, name, val):
+        name = name.lower()
+
+        # A few strides may be specified as "videoStride"
+        if name in ("genomeanalysisstride", "updategraphlogstride", "trajectorystride") and val == "videoStride":
+            setattr(self, self._ingestTable[name][0], self.videoStride)
+            return
+
+        if name == "replacebarriertypegenerationnumber" and checkIfInt(val) and int(val) >= -1:
+            self.replaceBarrierTypeGenerationNumber = 0xffffffff if int(val) == -1 else int(val)
+            return
+
+        entry = self._ingestTable.get(name)
+        if entry is not None:
+            member, kind, isValid = entry
+            value = None
+            if kind == "uint" and checkIfUint(val):
+                value = int(val)
+            elif kind == "int" and checkIfInt(val):
+                value = int(val)
+            elif kind == "float" and checkIfFloat(val):
+                value = float(val)
+            elif kind == "bool" and checkIfBool(val):
+                value = getBoolVal(val)
+            elif kind == "str":
+                value = val
+
+            if value is not None and (isValid is None or isValid(value)):
+                setattr(self, member, value)
+                return
+
+        print("Invalid param: {} = {}".format(name, val))
+
+    def updateFromConfigFile(self):
+        try:
+            cFile = open(self.configFilename)
+        except OSError:
+            print("Couldn't open config file {}.".format(self.configFilename), file=sys.stderr)
+            return
+
+        with cFile:
+            for line in cFile:
+                line = "".join(line.split())
+                if not line or line[0] == '#':
+                    continue
+
+                name, _, value = line.partition("=")
+                value = value.split("#")[0]
+                self.ingestParameter(name, value)
+
+
+# Returns a copy of params with default values overridden by the values
+# in the specified config file.
+def paramsInit(configFilename="biosim4.ini"):
+    p = Params()
+    p.registerConfigFile(configFilename)
+    p.updateFromConfigFile()
+    return p
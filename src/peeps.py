@@ -2,68 +2,195 @@
 #
 # Manages a container of individual agents of type Indiv and their
 # locations in the grid container
+#
+# The agents are stored as a structure of arrays: one NumPy column per Indiv
+# member, indexed by the agent's index. Index value 0 is reserved, i.e.,
+# row 0 of every column is not a valid individual. peeps[index] returns an
+# Indiv view onto one row; whole-population code should work on the
+# columns directly instead.
+#
+# The deferred death and move queues are preallocated NumPy buffers with a
+# fill count, so queueing a batch of records is one slice assignment and a
+# drain is a handful of array operations.
 
-#from dataclasses import dataclass, field
-
-class SimpleQueue:
-
-    def __init__(self):
-        self.items = []
-
-    def isEmpty(self):
-        return self.items == []
-
-    def enqueue(self, item):
-        self.items.insert(0,item)
-
-    def dequeue(self):
-        return self.items.pop()
-
-    def size(self):
-        return len(self.items)
-
-class deathQueue(SimpleQueue):
-    pass
+import numpy as np
 
-class moveQueue(SimpleQueue):
-    pass
+from src.basicTypes import asDir, random8
+from src.genome import GENE_DTYPE, genomeOffsets
+from src.indiv import Indiv
 
 class Peeps():
 
+    # Name and dtype of every per-agent column
+    COLUMNS = (
+        ("alive", np.bool_),
+        ("locX", np.int16),
+        ("locY", np.int16),
+        ("birthLocX", np.int16),
+        ("birthLocY", np.int16),
+        ("age", np.uint32),
+        ("responsiveness", np.float32),   # 0.0..1.0 (0 is like asleep)
+        ("oscPeriod", np.uint32),         # 2..4*p.stepsPerGeneration
+        ("longProbeDist", np.uint32),     # distance for long forward probe for obstructions
+        ("lastMoveDir", np.uint8),        # Compass value of last movement
+        ("challengeBits", np.uint32),     # modified when the indiv accomplishes some task
+        ("genomeOffset", np.uint32),      # start of the genome in the population genome buffer
+        ("genomeLength", np.uint16),      # number of genes in the genome
+    )
+
     def __init__(self, population):
 
-        self.dq = deathQueue()
-        self.mq = deathQueue()
         self.population = population
 
         #Index 0 is reserved, so add one:
         self.individuals = self.population + 1
 
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(self.individuals, dtype=dtype))
+
+        # The genomes of the whole population, back to back, see setGenomes()
+        self.genes = np.zeros(0, dtype=GENE_DTYPE)
+
+        # Everybody can queue one move per simStep, and usually few deaths are
+        # queued, so neither buffer should need to grow.
+        self.deathQueue = np.zeros(self.individuals, dtype=np.uint16)
+        self.deathQueueLen = 0
+        self.moveQueueIndex = np.zeros(self.individuals, dtype=np.uint16)
+        self.moveQueueX = np.zeros(self.individuals, dtype=np.int16)
+        self.moveQueueY = np.zeros(self.individuals, dtype=np.int16)
+        self.moveQueueLen = 0
+
     def ret_population(self):
         return self.population
 
     def ret_individuals(self):
         return self.individuals
 
-    # Indiv will remain alive and in-world until end of sim step when
-    # drainDeathQueue() is called.
-    def queueForDeath(self, indiv):
-        self.dq.enqueue(indiv)
+    # Direct access:
+    def __getitem__(self, index):
+        return Indiv(self, index)
+
+    # getIndiv() does no error checking -- check first that loc is occupied
+    def getIndiv(self, grid, loc):
+        return self[int(grid.at(*loc))]
+
+    # Replaces the genomes of the individuals in index with the genomes
+    # packed in genes, in the same order, of the specified lengths (see
+    # genome.packGenomes()). Everybody else's genome is dropped, so this is
+    # meant for spawning a whole generation.
+    def setGenomes(self, index, genes, lengths):
+        self.genes = np.asarray(genes, dtype=GENE_DTYPE)
+        self.genomeOffset[index] = genomeOffsets(lengths)
+        self.genomeLength[index] = lengths
+
+    # Returns a view of the genome of one individual
+    def genome(self, index):
+        offset = int(self.genomeOffset[index])
+        return self.genes[offset:offset + int(self.genomeLength[index])]
+
+    # Returns copies of the genomes of the individuals in index, packed in one
+    # buffer in the same order, as (genes, lengths)
+    def getGenomes(self, index):
+        lengths = self.genomeLength[index].astype(np.int64)
+        starts = np.repeat(self.genomeOffset[index].astype(np.int64) - genomeOffsets(lengths), lengths)
+        return self.genes[starts + np.arange(int(lengths.sum()))], lengths
+
+    # Returns the indexes of all the living individuals
+    def livingIndexes(self):
+        return np.flatnonzero(self.alive)
+
+    # This is called when individuals are spawned, for any number of them at
+    # once; index, x and y may be scalars or arrays of equal length.
+    # The responsiveness parameter will be initialized here to maximum value
+    # of 1.0, depending on which action activation function is used,
+    # the default undriven value may be changed to 1.0 or action midrange.
+    def initialize(self, index, x, y, grid, rng, longProbeDist):
+        index = np.atleast_1d(index)
+        self.alive[index] = True
+        self.locX[index] = x
+        self.locY[index] = y
+        self.birthLocX[index] = x
+        self.birthLocY[index] = y
+        grid.set(x, y, index)
+        self.age[index] = 0
+        self.oscPeriod[index] = 34  # ToDo !!! define a constant
+        self.lastMoveDir[index] = random8(rng, index.size)
+        self.responsiveness[index] = 0.5  # range 0.0..1.0
+        self.longProbeDist[index] = longProbeDist
+        self.challengeBits[index] = 0  # will be set True when some task gets accomplished
 
-    # TODO
-    # This executes all the
+    # Indiv will remain alive and in-world until end of sim step when
+    # drainDeathQueue() is called. index may be a scalar or an array.
+    def queueForDeath(self, index):
+        index = np.atleast_1d(index)
+        n = self.deathQueueLen
+        self.deathQueue = _reserve(self.deathQueue, n + index.size)
+        self.deathQueue[n:n + index.size] = index
+        self.deathQueueLen = n + index.size
+
+    # Called at end of sim step. This executes all the
     # queued deaths, removing the dead agents from the grid.
-    #def drainDeathQueue():
-
-    # indiv won't move until end
-    # of sim step when drainMoveQueue() is called.
-    def queueForMove(self, indiv, newloc):
-        indiv_newloc = {}
-        indiv_newloc[indiv] = newloc
-        self.mq.enqueue(indiv_newloc)
-
-    # TODO
-    # This executes all the queued movements. Each movement is 
-    # typically one 8-neighbor cell distance but this
+    def drainDeathQueue(self, grid):
+        index = self.deathQueue[:self.deathQueueLen]
+        grid.set(self.locX[index], self.locY[index], 0)
+        self.alive[index] = False
+        self.deathQueueLen = 0
+
+    def deathQueueSize(self):
+        return self.deathQueueLen
+
+    # indiv won't move until end of sim step when drainMoveQueue() is called.
+    # index, newX and newY may be scalars or arrays of equal length.
+    def queueForMove(self, index, newX, newY):
+        index = np.atleast_1d(index)
+        n, m = self.moveQueueLen, self.moveQueueLen + index.size
+        self.moveQueueIndex = _reserve(self.moveQueueIndex, m)
+        self.moveQueueX = _reserve(self.moveQueueX, m)
+        self.moveQueueY = _reserve(self.moveQueueY, m)
+        self.moveQueueIndex[n:m] = index
+        self.moveQueueX[n:m] = newX
+        self.moveQueueY[n:m] = newY
+        self.moveQueueLen = m
+
+    # Called at end of sim step. This executes all the queued movements.
+    # Each movement is typically one 8-neighbor cell distance but this
     # function can move an individual any arbitrary distance.
-    #def drainMoveQueue():
+    #
+    # All the moves are decided against the grid as it is before the drain:
+    # when several individuals want the same location, the first one queued
+    # gets it, and a move is only made if its location is empty before the
+    # drain. Unlike applying the moves one at a time, a location vacated by
+    # another move of the same drain is not available. Individuals that
+    # died this simStep stay where they are.
+    def drainMoveQueue(self, grid):
+        n = self.moveQueueLen
+        index = self.moveQueueIndex[:n]
+        newX, newY = self.moveQueueX[:n], self.moveQueueY[:n]
+        self.moveQueueLen = 0
+
+        living = self.alive[index]
+        index, newX, newY = index[living], newX[living], newY[living]
+
+        # First writer wins: np.unique() returns the first occurrence of
+        # each target location
+        _, first = np.unique(newX.astype(np.int32) * grid.sizeY() + newY, return_index=True)
+        first = first[grid.isEmptyAt(newX[first], newY[first])]
+        index, newX, newY = index[first], newX[first], newY[first]
+
+        grid.set(self.locX[index], self.locY[index], 0)
+        grid.set(newX, newY, index)
+        self.lastMoveDir[index] = asDir(newX - self.locX[index], newY - self.locY[index])
+        self.locX[index] = newX
+        self.locY[index] = newY
+
+    def moveQueueSize(self):
+        return self.moveQueueLen
+
+
+# Returns buffer, or a copy with twice the room if it can't hold size items
+def _reserve(buffer, size):
+    if size <= buffer.size:
+        return buffer
+    grown = np.zeros(max(size, 2 * buffer.size), dtype=buffer.dtype)
+    grown[:buffer.size] = buffer
+    return grown
@@ -0,0 +1,89 @@
+# rng.py
+#
+# Random number service; replaces the RandomUintGenerator of random.cpp.
+#
+# random.cpp gives every thread a private scalar generator that is called in
+# the inner loops, so the random numbers an individual gets depend on which
+# thread processed it and in which order. Here all the random numbers are
+# drawn in bulk from NumPy Generators (PCG64), each seeded with a
+# SeedSequence derived from the simulator seed and a key that says what the
+# numbers are for:
+#
+#     generation rng    (SPAWN, restarts, generation)
+#                       spawning, barriers and other between-generation work
+#     end of simStep    (END_OF_SIM_STEP, restarts, generation, simStep)
+#                       challenge bookkeeping in endOfSimStep()
+#     agent rows        (SIM_STEP, restarts, generation, simStep, block)
+#                       the sensors and actions of the agents, see RowStreams
+#
+# With p.deterministic the seed is p.RNGSeed and a run is repeatable
+# bit for bit, whatever the number of worker processes.
+
+import numpy as np
+
+# Agent rows are split into fixed blocks of this many rows, one stream each
+BLOCK_SIZE = 256
+
+SPAWN = 0
+END_OF_SIM_STEP = 1
+SIM_STEP = 2
+
+
+# Returns the Generator of the stream with the specified key
+def _generator(entropy, key):
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy, spawn_key=key)))
+
+
+class RowStreams:
+    """ Random numbers of the agent rows lo..hi-1 for one simStep"""
+
+    # Every draw takes one number per row of the whole blocks covering
+    # lo..hi-1 from each block's stream and returns the numbers of the
+    # requested rows. A row therefore gets the same number for the same draw
+    # whichever slice of the population it is processed in, as long as every
+    # slice makes the same sequence of draws, as simStepSlice() does.
+    def __init__(self, entropy, key, lo, hi):
+        self.firstRow = (lo // BLOCK_SIZE) * BLOCK_SIZE
+        blocks = range(lo // BLOCK_SIZE, max(hi - 1, lo) // BLOCK_SIZE + 1)
+        self.generators = [_generator(entropy, tuple(key) + (block,)) for block in blocks]
+
+    def _draw(self, draw, rows):
+        values = np.concatenate([draw(generator) for generator in self.generators])
+        return values[np.asarray(rows, dtype=np.intp) - self.firstRow]
+
+    # Returns a float 0.0..1.0 for each of the rows
+    def random(self, rows):
+        return self._draw(lambda generator: generator.random(BLOCK_SIZE), rows)
+
+    # Returns an int low..high-1 for each of the rows
+    def integers(self, low, high, rows):
+        return self._draw(lambda generator: generator.integers(low, high, size=BLOCK_SIZE), rows)
+
+
+class RandomService:
+    """ Source of the random number streams of the simulator"""
+
+    # seed None draws a fresh seed from the OS
+    def __init__(self, seed=None):
+        self.seed = np.random.SeedSequence(seed).entropy
+        # Keys are reused when the simulation starts over from generation 0,
+        # so the number of restarts is part of every key
+        self.restarts = 0
+
+    def startOver(self):
+        self.restarts += 1
+
+    # Generator for the work between the generations
+    def generationRng(self, generation):
+        return _generator(self.seed, (SPAWN, self.restarts, generation))
+
+    # Generator for the single-thread part of a simStep
+    def endOfSimStepRng(self, generation, simStep):
+        return _generator(self.seed, (END_OF_SIM_STEP, self.restarts, generation, simStep))
+
+    # Key of the agent row streams of a simStep, see RowStreams
+    def simStepKey(self, generation, simStep):
+        return (SIM_STEP, self.restarts, generation, simStep)
+
+    def rowStreams(self, generation, simStep, lo, hi):
+        return RowStreams(self.seed, self.simStepKey(generation, simStep), lo, hi)
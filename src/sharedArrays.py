@@ -0,0 +1,100 @@
+# sharedArrays.py
+#
+# Shares NumPy arrays between the main process and the simStep worker
+# processes without copying them through pipes.
+#
+# The main process publishes an array under a name: the data is copied once
+# into a multiprocessing.shared_memory block and a view onto that block is
+# returned, which the owner keeps using in place of the original array. As
+# long as the owner only writes into the array, publishing it again costs
+# nothing. Code that rebinds the attribute to a new array (a reallocation,
+# a recomputed field) simply gets it published again at the next
+# shareAttributes() call.
+#
+# The workers receive the small descriptors() dict and attach views onto the
+# same blocks with attachArrays(), caching the attachments by block name.
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArrays:
+    """ Named NumPy arrays published in shared memory"""
+
+    def __init__(self):
+        self.blocks = {}  # name -> (SharedMemory, ndarray view)
+
+    # Returns a view onto shared memory holding a copy of array. The block of
+    # the name is reused if the shape and dtype still match.
+    def publish(self, name, array):
+        entry = self.blocks.get(name)
+        if entry is not None and entry[1] is array:
+            return array
+
+        if entry is None or entry[1].shape != array.shape or entry[1].dtype != array.dtype:
+            if entry is not None:
+                self._release(entry[0])
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            entry = (shm, np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf))
+            self.blocks[name] = entry
+
+        entry[1][...] = array
+        return entry[1]
+
+    # Publishes the named array attributes of obj as prefix.name and
+    # rebinds them to the shared views
+    def shareAttributes(self, prefix, obj, names):
+        for name in names:
+            setattr(obj, name, self.publish(prefix + "." + name, getattr(obj, name)))
+
+    # Publishes every array of a dict as prefix.key, in place
+    def shareDict(self, prefix, arrays):
+        for key, array in arrays.items():
+            arrays[key] = self.publish(prefix + "." + key, np.ascontiguousarray(array))
+
+    # Returns what the workers need to attach the arrays, as
+    # name -> (block name, shape, dtype)
+    def descriptors(self):
+        return {name: (shm.name, view.shape, view.dtype.str) for name, (shm, view) in self.blocks.items()}
+
+    def close(self):
+        for shm, _ in self.blocks.values():
+            self._release(shm)
+        self.blocks = {}
+
+    @staticmethod
+    def _release(shm):
+        shm.close()
+        shm.unlink()
+
+
+# Worker side of SharedArrays: returns name -> ndarray for the descriptors.
+# cache maps block names to their SharedMemory and is updated in place;
+# blocks that are no longer published are closed once nothing uses them.
+def attachArrays(descriptors, cache):
+    arrays = {}
+    for name, (blockName, shape, dtype) in descriptors.items():
+        if blockName not in cache:
+            cache[blockName] = _attach(blockName)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=cache[blockName].buf)
+
+    inUse = {blockName for blockName, _, _ in descriptors.values()}
+    for blockName in list(cache):
+        if blockName not in inUse:
+            try:
+                cache[blockName].close()
+                del cache[blockName]
+            except BufferError:
+                pass  # the caller still holds views of it, try again next time
+    return arrays
+
+
+# The main process owns the blocks, so a worker must not have them unlinked
+# by its resource tracker when it exits. Python 3.13 can say so; forked
+# workers of older versions share the tracker of the main process anyway.
+def _attach(blockName):
+    try:
+        return shared_memory.SharedMemory(name=blockName, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=blockName)
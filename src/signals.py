@@ -0,0 +1,77 @@
+# signals.py
+# Manages layers of pheremones
+#
+# All the layers live in one uint8 NumPy array, data[layer, x, y], so a
+# fade is one saturating subtract over a whole layer and all the emissions
+# of a simStep are applied together.
+#
+# Usage: magnitude = signals[layer][x, y]
+# or     magnitude = signals.getMagnitude(layer, x, y)
+
+import numpy as np
+
+from src.grid import visitNeighborhood
+
+SIGNAL_MIN = 0
+SIGNAL_MAX = 255
+
+
+# The cells an emission increases, as offsets from the emitter and amounts:
+# every cell of the radius 1.5 neighborhood by neighborIncreaseAmount, and
+# the center cell by centerIncreaseAmount on top of that.
+def _emissionStamp():
+    radius = 1.5
+    centerIncreaseAmount = 2
+    neighborIncreaseAmount = 1
+    offsets = []
+    visitNeighborhood((2, 2), radius, offsets.append, 5, 5)
+    dx = np.array([x - 2 for x, _ in offsets], dtype=np.int32)
+    dy = np.array([y - 2 for _, y in offsets], dtype=np.int32)
+    amount = np.full(len(offsets), neighborIncreaseAmount, dtype=np.int32)
+    amount[(dx == 0) & (dy == 0)] += centerIncreaseAmount
+    return dx, dy, amount
+
+
+_STAMP_DX, _STAMP_DY, _STAMP_AMOUNT = _emissionStamp()
+
+
+class Signals:
+    """ Container for pheromones"""
+
+    def __init__(self):
+        self.data = np.zeros((0, 0, 0), dtype=np.uint8)
+
+    def init(self, numLayers, sizeX, sizeY):
+        self.data = np.zeros((numLayers, sizeX, sizeY), dtype=np.uint8)
+
+    def __getitem__(self, layerNum):
+        return self.data[layerNum]
+
+    def getMagnitude(self, layerNum, x, y):
+        return self.data[layerNum, x, y]
+
+    # Increases the emitter locations by centerIncreaseAmount, and the
+    # neighboring cells by neighborIncreaseAmount, saturating at SIGNAL_MAX.
+    # x and y are arrays holding any number of emitter locations; overlapping
+    # stamps add up as if the emitters were applied one at a time.
+    def increment(self, layerNum, x, y):
+        layer = self.data[layerNum]
+        sizeX, sizeY = layer.shape
+        x = np.asarray(x, dtype=np.int32).reshape(-1, 1) + _STAMP_DX
+        y = np.asarray(y, dtype=np.int32).reshape(-1, 1) + _STAMP_DY
+        amount = np.broadcast_to(_STAMP_AMOUNT, x.shape)
+        inBounds = (x >= 0) & (x < sizeX) & (y >= 0) & (y < sizeY)
+
+        total = layer.astype(np.int32)
+        np.add.at(total, (x[inBounds], y[inBounds]), amount[inBounds])
+        np.minimum(total, SIGNAL_MAX, out=total)
+        layer[...] = total
+
+    def zeroFill(self):
+        self.data.fill(0)
+
+    # Fades the signals
+    def fade(self, layerNum):
+        fadeAmount = 1
+        layer = self.data[layerNum]
+        np.subtract(layer, np.minimum(layer, fadeAmount), out=layer)
@@ -0,0 +1,126 @@
+# simStepPool.py
+#
+# Executes one simStep for the whole population, either in the main process
+# or spread over a pool of worker processes.
+#
+# simulator.cpp runs simStepOneIndiv() on p.numThreads OpenMP threads, with
+# the grid read-only and the movements and deaths deferred to queues that
+# endOfSimStep() drains in a single thread. Python threads can't run the
+# NumPy-light parts of a simStep in parallel, so SimStepPool uses processes
+# instead. Each worker owns a contiguous slice of the population rows and
+# sees the grid, the signals, the sensor fields, the peeps columns and the
+# neural nets through zero-copy shared memory views (see sharedArrays.py).
+# A worker writes only its own rows (age, responsiveness, neuron outputs,
+# ...) and returns the rest of its actions as an ActionIntents, which the
+# main process queues in slice order for the endOfSimStep() drain, just as
+# if the population had been processed in one pass. The random numbers come
+# from the RowStreams of the simStep (see rng.py), so the results don't
+# depend on the number of workers.
+
+import multiprocessing
+
+import numpy as np
+
+from src.executeActions import executeActions
+from src.feedForward import NeuralNetBatch
+from src.getSensor import Sensors
+from src.grid import Grid
+from src.peeps import Peeps
+from src.rng import RowStreams
+from src.sharedArrays import SharedArrays, attachArrays
+from src.signals import Signals
+
+
+# Execute one simStep for the individuals in rows lo..hi-1: sense, feed
+# forward and act. rng is the RowStreams of the simStep covering the slice.
+# Returns the ActionIntents of the slice.
+def simStepSlice(simStep, p, peeps, grid, sensors, nnet, rng, lo, hi):
+    peeps.age[lo:hi] += peeps.alive[lo:hi]  # for this implementation, tracks simStep
+    sensorValues = sensors.computeAllSensors(simStep, rng, lo, hi)
+    actionLevels = nnet.feedForward(sensorValues, lo, hi)
+    return executeActions(p, peeps, grid, actionLevels, rng, lo, hi)
+
+
+# The array attributes the workers read or write, per object
+_SHARED = (
+    ("peeps", tuple(name for name, _ in Peeps.COLUMNS) + ("genes",)),
+    ("grid", ("data", "barrierSteps")),
+    ("signals", ("data",)),
+    ("sensors", ("sensorsInUse",)),
+    ("nnet", ("toNeurons", "toActions", "driven", "neuronOutputs")),
+)
+
+
+class SimStepPool:
+    """ Worker processes executing the simStep for slices of the population"""
+
+    def __init__(self, numWorkers, p, peeps, grid, signals, sensors, nnet):
+        self.objects = {"peeps": peeps, "grid": grid, "signals": signals, "sensors": sensors, "nnet": nnet}
+        self.shared = SharedArrays()
+        self.share()
+
+        # Contiguous slices of rows 1..population, index 0 is reserved
+        bounds = np.linspace(1, peeps.individuals, numWorkers + 1).astype(int)
+        self.slices = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if lo < hi]
+        self.pool = multiprocessing.Pool(len(self.slices), initializer=_initWorker, initargs=(p,))
+
+    # Moves the shared arrays that were rebound since the last call, e.g. the
+    # sensor fields of this simStep, into shared memory
+    def share(self):
+        for prefix, names in _SHARED:
+            self.shared.shareAttributes(prefix, self.objects[prefix], names)
+        self.shared.shareDict("sensors.fields", self.objects["sensors"].fields)
+
+    # Executes one simStep in the workers. Each worker draws its random
+    # numbers from the RowStreams of its slice for the specified seed and
+    # stream key, see RandomService.simStepKey(). Returns the ActionIntents
+    # of the slices, in row order.
+    def simStep(self, simStep, seed, streamKey):
+        self.share()
+        descriptors = self.shared.descriptors()
+        tasks = [(simStep, lo, hi, descriptors, seed, streamKey) for lo, hi in self.slices]
+        return self.pool.map(_workerSimStep, tasks)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.shared.close()
+
+
+# ---------------------------- Worker process side ----------------------------
+
+_worker = None
+
+
+def _initWorker(p):
+    global _worker
+    peeps = Peeps(p.population)
+    grid = Grid()
+    signals = Signals()
+    _worker = {
+        "p": p,
+        "peeps": peeps,
+        "grid": grid,
+        "signals": signals,
+        "sensors": Sensors(p, peeps, grid, signals),
+        "nnet": NeuralNetBatch(peeps.individuals),
+        "blocks": {},
+    }
+
+
+def _workerSimStep(task):
+    simStep, lo, hi, descriptors, seed, streamKey = task
+    w = _worker
+
+    fields = {}
+    for name, array in attachArrays(descriptors, w["blocks"]).items():
+        prefix, attr = name.split(".", 1)
+        if attr.startswith("fields."):
+            fields[attr[len("fields."):]] = array
+        else:
+            setattr(w[prefix], attr, array)
+    w["sensors"].fields = fields
+    w["nnet"].numNeurons = w["nnet"].driven.shape[1]
+
+    return simStepSlice(simStep, w["p"], w["peeps"], w["grid"], w["sensors"], w["nnet"],
+                        RowStreams(seed, streamKey, lo, hi), lo, hi)
@@ -2,10 +2,25 @@
 
 # This file contains Simulator(), the top-level entry point of the simulator.
 
-from src.peeps import Peeps
-from src.spawnNewGeneration import initializeGenerationZero
+import time
+
+import numpy as np
 
-POPULATION = 300
+from src.params import paramsInit
+from src.grid import Grid
+from src.peeps import Peeps
+from src.signals import Signals
+from src.feedForward import NeuralNetBatch
+from src.brainCache import BrainCache
+from src.rng import RandomService
+from src.getSensor import Sensors
+from src.simStepPool import SimStepPool, simStepSlice
+from src.endOfSimStep import endOfSimStep
+from src.endOfGeneration import endOfGeneration
+from src.imageWriter import ImageWriter
+from src.trajectory import TrajectoryRecorder, isTrajectoryGeneration
+from src.epochLog import EpochLog
+from src.spawnNewGeneration import initializeGenerationZero, spawnNewGeneration
 
 
 # /********************************************************************************
@@ -21,12 +36,41 @@ POPULATION = 300
 class Simulator:
     """ Simulator class"""
 
+    # Simulator parameters are read from the default config file
+    # Todo: remove the hardcoded parameter filename.
+    p = paramsInit("biosim4.ini")
+
+    # All the random numbers come from the streams of the random service,
+    # see rng.py. rng is the generator of the current generation.
+    random = RandomService(p.RNGSeed if p.deterministic else None)
+    rng = random.generationRng(0)
 
     # grid.init
+    grid = Grid()
+    grid.init(p.sizeX, p.sizeY)
+
     # signals.init
+    signals = Signals()
+    signals.init(p.signalLayers, p.sizeX, p.sizeY)
 
     # peeps init
-    p = Peeps(POPULATION)
+    peeps = Peeps(p.population)
+
+    # The neural nets and sensors of the whole population
+    nnet = NeuralNetBatch(peeps.individuals)
+    # Compiled brains of recent genomes, enough for a few generations
+    brainCache = BrainCache(4 * p.population)
+    sensors = Sensors(p, peeps, grid, signals)
+
+    # Worker processes, see simStep()
+    pool = None
+
+    # Saves the video frames, see imageWriter.py
+    imageWriter = ImageWriter(p)
+    # Records the agent locations, see trajectory.py
+    trajectoryRecorder = TrajectoryRecorder(p)
+    # One row of statistics per generation, see epochLog.py
+    epochLog = EpochLog(p)
 
     #p.queueForDeath('12')
     #p.queueForMove('42', (12,13))
@@ -40,10 +84,73 @@ class Simulator:
     #p.queueForMove('47', (15,15))
     #p.queueForMove('92', (17,53))
 
-    print("INFO: pop: {}".format(p.ret_population()))
+    print("INFO: pop: {}".format(peeps.ret_population()))
     #print("INFO: indivs: {}".format(p.ret_individuals()))
-    #print("INFO: death queue length: {}".format(p.dq.size()))
-    #print("INFO: move queue length: {}".format(p.mq.size()))
+    #print("INFO: death queue length: {}".format(peeps.deathQueueSize()))
+    #print("INFO: move queue length: {}".format(peeps.moveQueueSize()))
 
     generation = 0
-    initializeGenerationZero(p)
+    initializeGenerationZero(p, peeps, grid, signals, nnet, brainCache, rng)
+    sensors.setSensorsInUse(nnet.sensorsInUse())
+
+    # Executes one simStep for the whole population. With p.numThreads > 1 the
+    # population is split over that many worker processes (see
+    # simStepPool.py); otherwise everything runs in this process. Returns the
+    # number of deaths queued during the simStep, for reporting purposes.
+    def simStep(self, simStep):
+        p, peeps = self.p, self.peeps
+        self.sensors.updateFields()
+
+        if p.numThreads > 1:
+            if self.pool is None:
+                self.pool = SimStepPool(p.numThreads, p, peeps, self.grid, self.signals, self.sensors, self.nnet)
+            allIntents = self.pool.simStep(simStep, self.random.seed,
+                                           self.random.simStepKey(self.generation, simStep))
+        else:
+            rowStreams = self.random.rowStreams(self.generation, simStep, 1, peeps.individuals)
+            allIntents = [simStepSlice(simStep, p, peeps, self.grid, self.sensors, self.nnet,
+                                       rowStreams, 1, peeps.individuals)]
+
+        # In single-thread mode: this executes deferred, queued deaths and movements,
+        # updates signal layers (pheromone), etc.
+        for intents in allIntents:
+            peeps.queueForDeath(intents.killIndex)
+            peeps.queueForMove(intents.moveIndex, intents.moveX, intents.moveY)
+        emitIndex = np.concatenate([intents.emitIndex for intents in allIntents])
+        self.signals.increment(0, peeps.locX[emitIndex], peeps.locY[emitIndex])
+        murderCount = peeps.deathQueueSize()
+        endOfSimStep(simStep, self.generation, p, peeps, self.grid, self.signals, self.imageWriter,
+                     self.random.endOfSimStepRng(self.generation, simStep))
+        if isTrajectoryGeneration(self.generation, p):
+            self.trajectoryRecorder.recordSimStep(peeps, self.grid)
+        return murderCount
+
+    # Executes the simSteps of one generation, then spawns the next one from
+    # the survivors. Returns the number of survivors.
+    def runGeneration(self):
+        murderCount = 0  # for reporting purposes
+        start = time.perf_counter()
+        for simStep in range(self.p.stepsPerGeneration):
+            murderCount += self.simStep(simStep)
+        self.epochLog.timings["simStepSeconds"] = time.perf_counter() - start
+
+        endOfGeneration(self.generation, self.p, self.imageWriter, self.trajectoryRecorder, self.epochLog)
+        self.rng = self.random.generationRng(self.generation + 1)
+        numberSurvivors = spawnNewGeneration(self.generation, murderCount, self.p, self.peeps, self.grid,
+                                             self.signals, self.nnet, self.brainCache, self.epochLog, self.rng)
+        if numberSurvivors == 0:
+            self.generation = 0  # start over
+            self.random.startOver()
+        else:
+            self.generation += 1
+        self.sensors.setSensorsInUse(self.nnet.sensorsInUse())
+        return numberSurvivors
+
+    # Stops the worker processes, if any
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self.imageWriter.abort()
+        self.trajectoryRecorder.close()
+        self.epochLog.close()
@@ -1,27 +1,149 @@
-from src.indiv import Indiv
+# spawnNewGeneration.py
+
+import numpy as np
+
+from src.createBarrier import createBarrier
+from src.genome import makeRandomGenomes, generateChildGenomes
+from src.kinship import kinPairs, firstKin
+from src.survivalCriteria import passedSurvivalCriteria, CHALLENGE_ALTRUISM, CHALLENGE_ALTRUISM_SACRIFICE
+
+
+# Places a new population at random locations in the cleared grid and gives
+# it the genomes packed in genes with the specified lengths, wired into
+# brains through the brain cache.
+def _spawnPopulation(genes, lengths, p, peeps, grid, nnet, brainCache, rng):
+    x, y = grid.findEmptyLocations(p.population, rng)
+    index = np.arange(1, p.population + 1, dtype=np.uint16)
+    peeps.initialize(index, x, y, grid, rng, p.longProbeDistance)
+    peeps.setGenomes(index, genes, lengths)
+    nnet.load(index, brainCache.wire(genes, lengths, p))
+
 
 # Requires that the grid, signals, peeps containers have been allocated.
 # This will erase the grid and signal layers, create a population in
 # the peeps container at random locations with random genomes.
-def initializeGenerationZero(p):
+def initializeGenerationZero(p, peeps, grid, signals, nnet, brainCache, rng):
 
     # The grid has already been allocated, clear and reuse it
-    #grid.zeroFill()
-    #grid.createBarrier(p.replaceBarrierTypeGenerationNumber == 0
-    #                   ? p.replaceBarrierType : p.barrierType)
+    grid.zeroFill()
+    createBarrier(grid, p.replaceBarrierType if p.replaceBarrierTypeGenerationNumber == 0
+                  else p.barrierType, p, rng)
 
     # The signal layers have already been allocated, just reuse them
-    #signals.zeroFill()
+    signals.zeroFill()
 
     # Spawn the population. The peeps container has already been allocated,
-    # just clear and reuse it
-    index = 1
-    while index <= p.population:
-        index = index + 1
+    # just clear and reuse it. All the spawn locations are drawn at once.
+    genes, lengths = makeRandomGenomes(p, rng, p.population)
+    _spawnPopulation(genes, lengths, p, peeps, grid, nnet, brainCache, rng)
+
+
+# Requires one or more parent genomes to choose from, packed in parentGenes
+# with the specified lengths and sorted by score. Called from
+# spawnNewGeneration(). This will erase the grid and signal layers, then
+# create a new population in the peeps container with random locations and
+# genomes derived from the parent genomes, all generated at once.
+def initializeNewGeneration(parentGenes, parentLengths, generation, p, peeps, grid, signals, nnet, brainCache, rng):
+
+    # The grid, signals, and peeps containers have already been allocated, just
+    # clear them if needed and reuse the elements
+    grid.zeroFill()
+    createBarrier(grid, p.replaceBarrierType if generation >= p.replaceBarrierTypeGenerationNumber
+                  else p.barrierType, p, rng)
+    signals.zeroFill()
+
+    # Spawn the population. This overwrites all the rows of peeps
+    genes, lengths = generateChildGenomes(parentGenes, parentLengths, p.population, p, rng)
+    _spawnPopulation(genes, lengths, p, peeps, grid, nnet, brainCache, rng)
+
+
+# At this point, the deferred death queue and move queue have been processed
+# and we are left with zero or more individuals who will repopulate the
+# world grid.
+# In order to redistribute the new population randomly, we will save all the
+# surviving genomes, then clear the grid of indexes and generate new
+# individuals.
+# Returns number of survivor-reproducers.
+# Must be called between generations, not during a simStep.
+def spawnNewGeneration(generation, murderCount, p, peeps, grid, signals, nnet, brainCache, epochLog, rng):
+    sacrificedCount = 0  # for the altruism challenge
+
+    # Only the parents whose genome results in valid neural connections count
+    hasBrain = nnet.numConnections > 0
+
+    # These will hold the indexes and survival scores (0.0..1.0) of all
+    # the survivors who will provide genomes for repopulation, in index order.
+    if p.challenge != CHALLENGE_ALTRUISM:
+        # First, find all the individuals who will become parents; save
+        # their scores for later sorting.
+        passed, score = passedSurvivalCriteria(p.challenge, p, peeps, grid)
+        parents = np.flatnonzero(passed & hasBrain)
+        scores = score[parents]
+    else:
+        # For the altruism challenge, test if the agent is inside either the sacrificial
+        # or the spawning area. We'll count the number in the sacrificial area and
+        # save the genomes of the ones in the spawning area, saving their scores
+        # for later sorting.
+        considerKinship = True
+
+        # This the test for the spawning area:
+        passed, score = passedSurvivalCriteria(CHALLENGE_ALTRUISM, p, peeps, grid)
+        parents = np.flatnonzero(passed & hasBrain)
+        scores = score[parents]
+
+        # This is the test for the sacrificial area, for the others:
+        sacrificed, _ = passedSurvivalCriteria(CHALLENGE_ALTRUISM_SACRIFICE, p, peeps, grid)
+        sacrificed &= hasBrain & ~(passed & hasBrain)
+        sacrificesIndexes = np.flatnonzero(sacrificed)  # those who gave their lives for the greater good
+        if not considerKinship:
+            sacrificedCount = len(sacrificesIndexes)
+
+        generationToApplyKinship = 10
+        altruismFactor = 10  # the saved:sacrificed ratio
+
+        if considerKinship:
+            if generation > generationToApplyKinship:
+                threshold = 0.7
+
+                # Each pass saves, for every sacrificed individual, the first
+                # kin found among the parents scanning from a random start,
+                # see kinship.py
+                parentGenes, parentLengths = peeps.getGenomes(parents)
+                genes, lengths = peeps.getGenomes(sacrificesIndexes)
+                query, parent = kinPairs(parentGenes, parentLengths, genes, lengths,
+                                         p.genomeComparisonMethod, threshold, rng)
+
+                sacrificedRows = np.tile(np.arange(len(sacrificesIndexes)), altruismFactor)
+                starts = rng.integers(0, max(len(parents), 1), size=len(sacrificedRows))
+                first = firstKin(query, parent, len(parents), sacrificedRows, starts)
+                survivingKin = first[first >= 0]
+
+                print("{} passed, {} sacrificed, {} saved".format(len(parents), len(sacrificesIndexes),
+                                                                 len(survivingKin)))
+                parents, scores = parents[survivingKin], scores[survivingKin]
+        else:
+            # Limit the parent list
+            numberSaved = sacrificedCount * altruismFactor
+            print("{} passed, {} sacrificed, {} saved".format(len(parents), sacrificedCount, numberSaved))
+            if len(parents) > 0 and numberSaved < len(parents):
+                parents, scores = parents[:numberSaved], scores[:numberSaved]
+
+    # Sort the indexes of the parents by their fitness scores, best first,
+    # and assemble all the parent genomes in that order
+    parents = parents[np.argsort(-scores, kind="stable")]
+    parentGenes, parentLengths = peeps.getGenomes(parents)
+
+    print("Gen {}, {} survivors".format(generation, len(parents)))
+    epochLog.append(generation, len(parents), murderCount, peeps, rng)
 
-    print(p.population)
-    print(index)
+    # Now we have zero or more parents' genomes
+    if len(parents) != 0:
+        # Spawn a new generation
+        initializeNewGeneration(parentGenes, parentLengths, generation + 1, p, peeps, grid, signals,
+                                nnet, brainCache, rng)
+    else:
+        # Special case: there are no surviving parents: start the simulation over
+        # from scratch with randomly-generated genomes
+        initializeGenerationZero(p, peeps, grid, signals, nnet, brainCache, rng)
 
-    #for (index = 1; index <= p.population; ++index)
-    #    peeps[index].initialize(index, grid.findEmptyLocation(), makeRandomGenome())
-    #p.initialize()
+    return len(parents)
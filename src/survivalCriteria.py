@@ -0,0 +1,273 @@
+# survivalCriteria.py
+#
+# The challenges, i.e. the survival criteria applied at the end of each
+# generation, see survival-criteria.cpp. The numbers are the values of the
+# challenge parameter in biosim4.ini.
+#
+# survival-criteria.cpp tests one individual at a time. Here each challenge
+# is a function of the peeps columns (location, birth location, alive,
+# challengeBits) that tests the whole population at once and returns a pair
+# of arrays with one value per peeps row: whether the individual passed and
+# its score 0.0..1.0 (0.0 if it failed). Row 0 never passes. The challenges
+# that count neighbors sample whole-grid occupancy sums instead of visiting
+# the neighborhood of every individual.
+
+import numpy as np
+
+from src.basicTypes import countBits, length
+from src.neighborhood import discSum
+
+CHALLENGE_CIRCLE = 0
+CHALLENGE_RIGHT_HALF = 1
+CHALLENGE_RIGHT_QUARTER = 2
+CHALLENGE_STRING = 3
+CHALLENGE_CENTER_WEIGHTED = 4
+CHALLENGE_CENTER_UNWEIGHTED = 40
+CHALLENGE_CORNER = 5
+CHALLENGE_CORNER_WEIGHTED = 6
+CHALLENGE_MIGRATE_DISTANCE = 7
+CHALLENGE_CENTER_SPARSE = 8
+CHALLENGE_LEFT_EIGHTH = 9
+CHALLENGE_RADIOACTIVE_WALLS = 10
+CHALLENGE_AGAINST_ANY_WALL = 11
+CHALLENGE_TOUCH_ANY_WALL = 12
+CHALLENGE_EAST_WEST_EIGHTHS = 13
+CHALLENGE_NEAR_BARRIER = 14
+CHALLENGE_PAIRS = 15
+CHALLENGE_LOCATION_SEQUENCE = 16
+CHALLENGE_ALTRUISM = 17
+CHALLENGE_ALTRUISM_SACRIFICE = 18
+
+
+# Offset lengths from a point, rounded down as Coord::length() does
+def _distance(x, y, centerX, centerY):
+    return length(x - centerX, y - centerY).astype(np.float64)
+
+
+def _passAll(passed):
+    return passed, passed.astype(np.float64)
+
+
+# Passed inside the radius, scored by the distance to the center if weighted
+def _insideCircle(x, y, centerX, centerY, radius, weighted):
+    distance = _distance(x, y, centerX, centerY)
+    passed = distance <= radius
+    if not weighted:
+        return _passAll(passed)
+    return passed, np.where(passed, (radius - distance) / radius, 0.0)
+
+
+def _onEdge(p, x, y):
+    return (x == 0) | (x == p.sizeX - 1) | (y == 0) | (y == p.sizeY - 1)
+
+
+# Number of occupied cells in the disc of the specified radius around each
+# individual, self included
+def _countOccupied(grid, x, y, radius):
+    return discSum(grid.occupiedMask(), radius)[x, y]
+
+
+# Survivors are those inside the circular area defined by
+# safeCenter and radius
+def _circle(p, peeps, grid, x, y):
+    return _insideCircle(x, y, int(p.sizeX / 4.0), int(p.sizeY / 4.0), p.sizeX / 4.0, True)
+
+
+# Survivors are all those on the right side of the arena
+def _rightHalf(p, peeps, grid, x, y):
+    return _passAll(x > p.sizeX // 2)
+
+
+# Survivors are all those on the right quarter of the arena
+def _rightQuarter(p, peeps, grid, x, y):
+    return _passAll(x > p.sizeX // 2 + p.sizeX // 4)
+
+
+# Survivors are all those on the left eighth of the arena
+def _leftEighth(p, peeps, grid, x, y):
+    return _passAll(x < p.sizeX // 8)
+
+
+# Survivors are those not touching the border and with exactly the number
+# of neighbors defined by neighbors and radius, where neighbors includes self.
+# As in the C++ version minNeighbors > maxNeighbors, so nobody passes.
+def _string(p, peeps, grid, x, y):
+    minNeighbors = 22
+    maxNeighbors = 2
+    radius = 1.5
+
+    count = _countOccupied(grid, x, y, radius)
+    return _passAll(~_onEdge(p, x, y) & (count >= minNeighbors) & (count <= maxNeighbors))
+
+
+# Survivors are those within the specified radius of the center. The score
+# is linearly weighted by distance from the center.
+def _centerWeighted(p, peeps, grid, x, y):
+    return _insideCircle(x, y, int(p.sizeX / 2.0), int(p.sizeY / 2.0), p.sizeX / 3.0, True)
+
+
+# Survivors are those within the specified radius of the center
+def _centerUnweighted(p, peeps, grid, x, y):
+    return _insideCircle(x, y, int(p.sizeX / 2.0), int(p.sizeY / 2.0), p.sizeX / 3.0, False)
+
+
+# Survivors are those within the specified outer radius of the center and with
+# the specified number of neighbors in the specified inner radius.
+# The score is not weighted by distance from the center.
+def _centerSparse(p, peeps, grid, x, y):
+    outerRadius = p.sizeX / 4.0
+    innerRadius = 1.5
+    minNeighbors = 5  # includes self
+    maxNeighbors = 8
+
+    inside, _ = _insideCircle(x, y, int(p.sizeX / 2.0), int(p.sizeY / 2.0), outerRadius, False)
+    count = _countOccupied(grid, x, y, innerRadius)
+    return _passAll(inside & (count >= minNeighbors) & (count <= maxNeighbors))
+
+
+# Survivors are those within the specified radius of any corner. With
+# weighted, the score is linearly weighted by distance from the corner point,
+# the first corner in the C++ order that's in range. Assumes square arena.
+def _nearCorner(p, x, y, radius, weighted):
+    assert p.sizeX == p.sizeY
+    passed = np.zeros(len(x), dtype=np.bool_)
+    score = np.zeros(len(x))
+    for cornerX, cornerY in ((0, 0), (0, p.sizeY - 1), (p.sizeX - 1, 0), (p.sizeX - 1, p.sizeY - 1)):
+        distance = _distance(x, y, cornerX, cornerY)
+        first = ~passed & (distance <= radius)
+        score[first] = (radius - distance[first]) / radius if weighted else 1.0
+        passed |= first
+    return passed, score
+
+
+def _corner(p, peeps, grid, x, y):
+    return _nearCorner(p, x, y, p.sizeX / 8.0, False)
+
+
+def _cornerWeighted(p, peeps, grid, x, y):
+    return _nearCorner(p, x, y, p.sizeX / 4.0, True)
+
+
+# This challenge is handled in endOfSimStep(), where individuals may die
+# at the end of any sim step. There is nothing else to do here at the
+# end of a generation. All remaining alive become parents.
+def _radioactiveWalls(p, peeps, grid, x, y):
+    return _passAll(np.ones(len(x), dtype=np.bool_))
+
+
+# Survivors are those touching any wall at the end of the generation
+def _againstAnyWall(p, peeps, grid, x, y):
+    return _passAll(_onEdge(p, x, y))
+
+
+# This challenge is partially handled in endOfSimStep(), where individuals
+# that are touching a wall are flagged in their challengeBits. They are
+# allowed to continue living. Here at the end of the generation, any that
+# never touch a wall will die. All that touched a wall at any time during
+# their life will become parents.
+def _touchAnyWall(p, peeps, grid, x, y):
+    return _passAll(peeps.challengeBits != 0)
+
+
+# Everybody survives and are candidate parents, but scored by how far
+# they migrated from their birth location.
+def _migrateDistance(p, peeps, grid, x, y):
+    distance = _distance(x, y, peeps.birthLocX.astype(np.int32), peeps.birthLocY.astype(np.int32))
+    return np.ones(len(x), dtype=np.bool_), distance / float(max(p.sizeX, p.sizeY))
+
+
+# Survivors are all those on the left or right eighths of the arena
+def _eastWestEighths(p, peeps, grid, x, y):
+    return _passAll((x < p.sizeX // 8) | (x >= p.sizeX - p.sizeX // 8))
+
+
+# Survivors are those within radius of any barrier center. Weighted by distance.
+def _nearBarrier(p, peeps, grid, x, y):
+    radius = float(p.sizeX // 2)
+
+    centers = grid.getBarrierCenters().astype(np.int32)
+    minDistance = np.full(len(x), 1e8)
+    if len(centers) > 0:
+        # (population, numCenters) distances
+        distance = _distance(x[:, None], y[:, None], centers[:, 0], centers[:, 1])
+        minDistance = distance.min(axis=1)
+    passed = minDistance <= radius
+    return passed, np.where(passed, 1.0 - minDistance / radius, 0.0)
+
+
+# Survivors are those not touching a border and with exactly one neighbor which
+# has no other neighbor. As in the C++ version, the neighbors are only looked
+# for in the 2x2 cells at offsets -1..0 from a location, i.e. the three cells
+# below and to the left of it, not in the whole 3x3 neighborhood.
+def _pairs(p, peeps, grid, x, y):
+    # occupied is padded with two empty columns and rows at the low ends, so
+    # the cells at offset -1 and -2 of any location are in the array
+    occupied = np.zeros((p.sizeX + 2, p.sizeY + 2), dtype=np.int32)
+    occupied[2:, 2:] = grid.occupiedMask()
+    offsets = ((-1, -1), (-1, 0), (0, -1))
+
+    # Number of lower-left neighbors of every cell, on the same padding
+    lowerLeft = np.zeros_like(occupied)
+    for dx, dy in offsets:
+        lowerLeft[2:, 2:] += occupied[2 + dx:occupied.shape[0] + dx, 2 + dy:occupied.shape[1] + dy]
+
+    px, py = x + 2, y + 2
+    # The neighbor, if there is exactly one, must not have any other lower-left
+    # neighbor; the individual itself is never one of them
+    neighborsOfNeighbor = sum(occupied[px + dx, py + dy] * lowerLeft[px + dx, py + dy] for dx, dy in offsets)
+    return _passAll(~_onEdge(p, x, y) & (lowerLeft[px, py] == 1) & (neighborsOfNeighbor == 0))
+
+
+# Survivors are those that contacted one or more specified locations in a sequence,
+# ranked by the number of locations contacted. There will be a bit set in their
+# challengeBits member for each location contacted.
+def _locationSequence(p, peeps, grid, x, y):
+    maxNumberOfBits = 32
+    count = countBits(peeps.challengeBits)
+    passed = count > 0
+    return passed, np.where(passed, count / float(maxNumberOfBits), 0.0)
+
+
+# Survivors are all those within the specified radius of the NE corner
+def _altruismSacrifice(p, peeps, grid, x, y):
+    radius = p.sizeX / 4.0  # in 128^2 world, holds 804 agents
+    return _insideCircle(x, y, p.sizeX - p.sizeX // 4, p.sizeY - p.sizeY // 4, radius, True)
+
+
+_CHALLENGE_FUNCTIONS = {
+    CHALLENGE_CIRCLE: _circle,
+    CHALLENGE_RIGHT_HALF: _rightHalf,
+    CHALLENGE_RIGHT_QUARTER: _rightQuarter,
+    CHALLENGE_STRING: _string,
+    CHALLENGE_CENTER_WEIGHTED: _centerWeighted,
+    CHALLENGE_CENTER_UNWEIGHTED: _centerUnweighted,
+    CHALLENGE_CORNER: _corner,
+    CHALLENGE_CORNER_WEIGHTED: _cornerWeighted,
+    CHALLENGE_MIGRATE_DISTANCE: _migrateDistance,
+    CHALLENGE_CENTER_SPARSE: _centerSparse,
+    CHALLENGE_LEFT_EIGHTH: _leftEighth,
+    CHALLENGE_RADIOACTIVE_WALLS: _radioactiveWalls,
+    CHALLENGE_AGAINST_ANY_WALL: _againstAnyWall,
+    CHALLENGE_TOUCH_ANY_WALL: _touchAnyWall,
+    CHALLENGE_EAST_WEST_EIGHTHS: _eastWestEighths,
+    CHALLENGE_NEAR_BARRIER: _nearBarrier,
+    CHALLENGE_PAIRS: _pairs,
+    CHALLENGE_LOCATION_SEQUENCE: _locationSequence,
+    # The spawning area of the altruism challenge is the circle
+    CHALLENGE_ALTRUISM: _circle,
+    CHALLENGE_ALTRUISM_SACRIFICE: _altruismSacrifice,
+}
+
+
+# Returns (passed, score): for every peeps row, whether the individual passed
+# the challenge and its score 0.0..1.0, 0.0 if it failed. The dead never pass.
+def passedSurvivalCriteria(challenge, p, peeps, grid):
+    function = _CHALLENGE_FUNCTIONS.get(challenge)
+    if function is None:
+        raise ValueError("Unknown challenge {}".format(challenge))
+
+    x, y = peeps.locX.astype(np.int32), peeps.locY.astype(np.int32)
+    passed, score = function(p, peeps, grid, x, y)
+    passed = passed & peeps.alive
+    passed[0] = False  # index 0 is reserved
+    return passed, np.where(passed, score, 0.0)
@@ -0,0 +1,180 @@
+# trajectory.py
+#
+# Records where every agent is at the end of every simStep, as a compact
+# alternative to the video frames of imageWriter.py, and reads the
+# recordings back for replay (see pybiosim4.py --replay).
+#
+# The recording of a run is one file, p.logDir/trajectories.bin, made of one
+# chunk per recorded generation. A chunk is a fixed header followed by a
+# zlib-compressed payload:
+#
+#     header    magic "TRJC", generation, numSteps, population, sizeX, sizeY,
+#               coordinate and delta type codes, numBarriers, payload length
+#     payload   colors        population x uint8, see makeGeneticColor()
+#               x0, y0        population x coord, locations after simStep 0
+#               dx, dy        (numSteps - 1) x population x delta, moves since
+#                             the previous simStep
+#               alive         numSteps x population bits
+#               barriers      numBarriers x 2 coord
+#
+# The agent index is the position in a row, index 1 first. Coordinates are
+# uint8 in a world of up to 256 x 256 and uint16 otherwise; agents move at
+# most one cell per simStep, so the deltas are int8 (int16 should they ever
+# jump further). TrajectoryFile reads the file through a memory map and
+# decompresses only the chunks asked for.
+
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from src.imageWriter import makeGeneticColor
+
+_MAGIC = b"TRJC"
+_HEADER = struct.Struct("<4sIIIHHBBIQ")
+_TYPES = (np.uint8, np.uint16, np.int8, np.int16)
+
+
+def _typeCode(dtype):
+    return _TYPES.index(dtype)
+
+
+# True if the agent locations of the generation are recorded
+def isTrajectoryGeneration(generation, p):
+    return p.saveTrajectories and generation % p.trajectoryStride == 0
+
+
+class TrajectoryRecorder:
+    """ Records the agent locations of whole generations"""
+
+    def __init__(self, p):
+        self.p = p
+        self.filename = os.path.join(p.logDir, "trajectories.bin")
+        self.file = None
+        self.numSteps = 0
+
+    # Copies the locations and the alive flags of rows 1..population after
+    # a simStep. The colors and barriers are taken at the first simStep.
+    def recordSimStep(self, peeps, grid):
+        rows = slice(1, peeps.individuals)
+        if self.numSteps == 0:
+            population = peeps.individuals - 1
+            steps = self.p.stepsPerGeneration
+            self.locX = np.zeros((steps, population), dtype=np.int16)
+            self.locY = np.zeros((steps, population), dtype=np.int16)
+            self.alive = np.zeros((steps, population), dtype=np.bool_)
+            self.colors = makeGeneticColor(peeps.genes, peeps.genomeOffset[rows], peeps.genomeLength[rows])
+            self.barrierLocs = np.array(grid.getBarrierLocations(), dtype=np.int16).reshape(-1, 2)
+
+        self.locX[self.numSteps] = peeps.locX[rows]
+        self.locY[self.numSteps] = peeps.locY[rows]
+        self.alive[self.numSteps] = peeps.alive[rows]
+        self.numSteps += 1
+
+    # Appends the chunk of the recorded simSteps to the file
+    def saveGeneration(self, generation):
+        if self.numSteps == 0:
+            return
+        if self.file is None:
+            os.makedirs(self.p.logDir, exist_ok=True)
+            self.file = open(self.filename, "wb")
+
+        numSteps, population = self.numSteps, self.locX.shape[1]
+        coordType = np.uint8 if max(self.p.sizeX, self.p.sizeY) <= 256 else np.uint16
+        dx = np.diff(self.locX[:numSteps], axis=0)
+        dy = np.diff(self.locY[:numSteps], axis=0)
+        fits = max(np.abs(dx).max(initial=0), np.abs(dy).max(initial=0)) <= 127
+        deltaType = np.int8 if fits else np.int16
+
+        payload = zlib.compress(b"".join((
+            self.colors.tobytes(),
+            self.locX[0].astype(coordType).tobytes(),
+            self.locY[0].astype(coordType).tobytes(),
+            dx.astype(deltaType).tobytes(),
+            dy.astype(deltaType).tobytes(),
+            np.packbits(self.alive[:numSteps]).tobytes(),
+            self.barrierLocs.astype(coordType).tobytes(),
+        )))
+        self.file.write(_HEADER.pack(_MAGIC, generation, numSteps, population, self.p.sizeX, self.p.sizeY,
+                                     _typeCode(coordType), _typeCode(deltaType), len(self.barrierLocs),
+                                     len(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.numSteps = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Trajectories:
+    """ The recorded locations of one generation"""
+
+    def __init__(self, generation, sizeX, sizeY, locX, locY, alive, colors, barrierLocs):
+        self.generation = generation
+        self.sizeX = sizeX
+        self.sizeY = sizeY
+        # (numSteps, population) arrays, column k is the agent of index k + 1
+        self.locX = locX
+        self.locY = locY
+        self.alive = alive
+        self.colors = colors
+        self.barrierLocs = barrierLocs
+
+    def numSteps(self):
+        return len(self.locX)
+
+
+class TrajectoryFile:
+    """ A trajectories.bin file, read through a memory map"""
+
+    def __init__(self, filename):
+        self.data = np.memmap(filename, dtype=np.uint8, mode="r") if os.path.getsize(filename) > 0 else b""
+        # (header fields, payload offset) of every chunk, in order
+        self.chunks = []
+        offset = 0
+        while offset + _HEADER.size <= len(self.data):
+            fields = _HEADER.unpack_from(self.data, offset)
+            if fields[0] != _MAGIC:
+                raise ValueError("{}: not a trajectory chunk at offset {}".format(filename, offset))
+            self.chunks.append((fields, offset + _HEADER.size))
+            offset += _HEADER.size + fields[-1]
+
+    # The recorded generations, in file order. A generation number appears
+    # more than once if the simulation started over.
+    def generations(self):
+        return [fields[1] for fields, _ in self.chunks]
+
+    # Returns the Trajectories of the last recorded chunk of a generation
+    def read(self, generation):
+        matches = [chunk for chunk in self.chunks if chunk[0][1] == generation]
+        if not matches:
+            raise KeyError("generation {} is not recorded".format(generation))
+        fields, offset = matches[-1]
+        _, generation, numSteps, population, sizeX, sizeY, coordCode, deltaCode, numBarriers, length = fields
+        coordType, deltaType = _TYPES[coordCode], _TYPES[deltaCode]
+        payload = zlib.decompress(self.data[offset:offset + length])
+
+        position = 0
+
+        # Returns the next count elements of the payload
+        def take(dtype, count):
+            nonlocal position
+            array = np.frombuffer(payload, dtype=dtype, count=count, offset=position)
+            position += array.nbytes
+            return array
+
+        colors = take(np.uint8, population)
+        x0 = take(coordType, population)
+        y0 = take(coordType, population)
+        dx = take(deltaType, (numSteps - 1) * population).reshape(numSteps - 1, population)
+        dy = take(deltaType, (numSteps - 1) * population).reshape(numSteps - 1, population)
+        alive = np.unpackbits(take(np.uint8, (numSteps * population + 7) // 8), count=numSteps * population)
+        barrierLocs = take(coordType, 2 * numBarriers).reshape(numBarriers, 2).astype(np.int64)
+
+        locX = np.cumsum(np.concatenate([x0[None].astype(np.int16), dx]), axis=0, dtype=np.int16)
+        locY = np.cumsum(np.concatenate([y0[None].astype(np.int16), dy]), axis=0, dtype=np.int16)
+        return Trajectories(generation, sizeX, sizeY, locX, locY,
+                            alive.reshape(numSteps, population).astype(np.bool_), colors, barrierLocs)
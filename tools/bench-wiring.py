@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Benchmarks the vectorized wiring compiler, genome.createWiringFromGenomes(),
+# against a straightforward port of Indiv::createWiringFromGenome() from
+# genome.cpp (less one bug, see referenceWiring()), on random 48- and
+# 300-gene genomes, and checks that both build the same neural nets.
+#
+# Usage: python3 tools/bench-wiring.py [numGenomes]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.genome import (createWiringFromGenomes, makeRandomGenes, sourceType, sourceNum,
+                        sinkType, sinkNum, weight)
+from src.genomeNeurons import NEURON, ACTION, NeuralNet
+from src.params import Params
+from src.sensorsActions import NUM_SENSES, NUM_ACTIONS
+
+
+# The reference: the node map and the connection list of genome.cpp as a
+# dict and a list, culled one neuron at a time. Like createWiringFromGenomes(),
+# it takes each neuron's driven flag from its own node, where genome.cpp
+# indexes the node map by the new neuron number (see the comment in
+# createWiringFromGenomes()); it does not reproduce that bug.
+def referenceWiring(genome, p):
+    connections = []
+    for srcType, srcNum, snkType, snkNum, w in zip(sourceType(genome).tolist(), sourceNum(genome).tolist(),
+                                                   sinkType(genome).tolist(), sinkNum(genome).tolist(),
+                                                   weight(genome).tolist()):
+        srcNum %= p.maxNumberNeurons if srcType == NEURON else NUM_SENSES
+        snkNum %= p.maxNumberNeurons if snkType == NEURON else NUM_ACTIONS
+        connections.append([srcType, srcNum, snkType, snkNum, w])
+
+    # node: [numOutputs, numSelfInputs, numInputsFromSensorsOrOtherNeurons]
+    nodeMap = {}
+    for srcType, srcNum, snkType, snkNum, _ in connections:
+        if snkType == NEURON:
+            node = nodeMap.setdefault(snkNum, [0, 0, 0])
+            if srcType == NEURON and srcNum == snkNum:
+                node[1] += 1
+            else:
+                node[2] += 1
+        if srcType == NEURON:
+            nodeMap.setdefault(srcNum, [0, 0, 0])[0] += 1
+
+    allDone = False
+    while not allDone:
+        allDone = True
+        for neuron in sorted(nodeMap):
+            if neuron in nodeMap and nodeMap[neuron][0] == nodeMap[neuron][1]:
+                allDone = False
+                kept = []
+                for conn in connections:
+                    if conn[2] == NEURON and conn[3] == neuron:
+                        if conn[0] == NEURON:
+                            nodeMap[conn[1]][0] -= 1
+                    else:
+                        kept.append(conn)
+                connections = kept
+                del nodeMap[neuron]
+
+    remapped = {neuron: n for n, neuron in enumerate(sorted(nodeMap))}
+    ordered = []
+    for sinkTypeWanted in (NEURON, ACTION):
+        for srcType, srcNum, snkType, snkNum, w in connections:
+            if snkType == sinkTypeWanted:
+                ordered.append((srcType, remapped[srcNum] if srcType == NEURON else srcNum,
+                                snkType, remapped[snkNum] if snkType == NEURON else snkNum, w))
+    driven = [nodeMap[neuron][2] != 0 for neuron in sorted(nodeMap)]
+    columns = list(zip(*ordered)) if ordered else [[]] * 5
+    return NeuralNet(*columns, driven)
+
+
+def sameNet(a, b):
+    return all(np.array_equal(getattr(a, name), getattr(b, name)) for name in NeuralNet.__slots__)
+
+
+def main():
+    numGenomes = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rng = np.random.default_rng(1)
+
+    for genomeLength in (48, 300):
+        p = Params()
+        p.setDefaults()
+        p.maxNumberNeurons = genomeLength // 2
+        lengths = np.full(numGenomes, genomeLength)
+        genes = makeRandomGenes(rng, numGenomes * genomeLength)
+        genomes = np.split(genes, numGenomes)
+
+        start = time.perf_counter()
+        reference = [referenceWiring(genome, p) for genome in genomes]
+        referenceTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled = createWiringFromGenomes(genes, lengths, p)
+        compiledTime = time.perf_counter() - start
+
+        mismatches = sum(not sameNet(a, b) for a, b in zip(reference, compiled))
+        print("{} genomes of {} genes: reference {:.3f} s, vectorized {:.3f} s ({:.1f}x), {} mismatches"
+              .format(numGenomes, genomeLength, referenceTime, compiledTime,
+                      referenceTime / compiledTime, mismatches))
+
+
+if __name__ == "__main__":
+    main()